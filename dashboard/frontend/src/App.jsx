@@ -58,6 +58,8 @@ function App() {
     socketRef.current.on('connect', () => {
       setOrchState('CONNECTED');
       addLog("Conectado al Orquestador");
+      // El audio crudo no sale del orquestador: solo el nivel diezmado, bajo suscripción
+      socketRef.current.emit('subscribe', { events: ['audio_level'] });
     });
 
     socketRef.current.on('disconnect', () => {
@@ -65,7 +67,7 @@ function App() {
       addLog("Desconectado del Orquestador");
     });
 
-    socketRef.current.on('audio_chunk', (data) => {
+    socketRef.current.on('audio_level', (data) => {
       // Normalizamos la energía para visualización (0-100 aprox)
       // Ajustar factor según sensibilidad
       const level = Math.min(100, (data.energy / 50));
@@ -8,6 +8,12 @@ class Config:
     STT_URI = os.getenv("STT_URI", "ws://localhost:8000/api/v1/streaming")
     TTS_URI = os.getenv("TTS_URI", "http://localhost:8001/api/tts/stream")
     RAG_URI = os.getenv("RAG_URI", "http://localhost:8002/ask")
+    RAG_STREAM_URI = os.getenv("RAG_STREAM_URI", RAG_URI.rstrip("/") + "/stream")
+
+    # STT Streaming (parciales mientras el usuario habla)
+    STT_STREAMING = os.getenv("STT_STREAMING", "true").lower() == "true"
+    STT_RESULT_TIMEOUT = float(os.getenv("STT_RESULT_TIMEOUT", "30"))
+    STT_PROFILE = os.getenv("STT_PROFILE", "")  # fast | accurate (vacío = default del servicio)
 
     # Wake Word (Local runtime)
     WAKE_WORD_MODEL = os.getenv("WAKE_WORD_MODEL", "hey_jarvis_v0.1")
@@ -23,6 +29,15 @@ class Config:
     MIC_ENERGY_THRESHOLD = int(os.getenv("MIC_ENERGY_THRESHOLD", "300"))
     MIC_DYNAMIC_ENERGY = os.getenv("MIC_DYNAMIC_ENERGY", "false").lower() == "true"
     MIC_GAIN = float(os.getenv("MIC_GAIN", "1.0"))
+    # Chunks que caben entre la captura y el event loop antes de descartar (64 x 80 ms ≈ 5 s)
+    AUDIO_RING_CHUNKS = int(os.getenv("AUDIO_RING_CHUNKS", "64"))
+    # Un evento "audio_level" para los medidores de la UI cada N chunks (3 x 80 ms ≈ 4 Hz)
+    AUDIO_LEVEL_EVERY = int(os.getenv("AUDIO_LEVEL_EVERY", "3"))
+
+    # Respuesta hablada frase a frase mientras el LLM genera (usa RAG_STREAM_URI)
+    RAG_STREAMING = os.getenv("RAG_STREAMING", "true").lower() == "true"
 
     # TTS Settings
     TTS_VOICE_FILE = os.getenv("TTS_VOICE_FILE", "")
+    TTS_FORMAT = os.getenv("TTS_FORMAT", "pcm")  # pcm | wav | opus (opus para altavoces remotos, requiere ffmpeg)
+    TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "0"))  # 0 = frecuencia nativa del modelo
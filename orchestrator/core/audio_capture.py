@@ -1,10 +1,12 @@
 import pyaudio
 import threading
 import asyncio
-import numpy as np
+import time
 from typing import Callable, List
 from config import Config
 from core.event_bus import EventBus
+from core.audio_ring import AudioRingBuffer
+from core.audio_dsp import AudioFrontEnd
 
 class AudioCapturer:
     def __init__(self, event_bus: EventBus):
@@ -28,6 +30,20 @@ class AudioCapturer:
         self.chunks_of_silence = 0
         self.max_silence_chunks = 20 # ~1.6s con chunks de 80ms
 
+        # Buffer entre el hilo de captura y el event loop: una única tarea lo vacía en
+        # orden, así la memoria está acotada aunque el loop esté ocupado con RAG/TTS
+        self.ring = AudioRingBuffer(Config.AUDIO_RING_CHUNKS, self.chunk * 2)  # int16 mono
+        # Ganancia, RMS, pico y ruido de fondo con buffers preasignados
+        self.dsp = AudioFrontEnd(self.chunk, gain=Config.MIC_GAIN)
+        self._ready = None
+        self._waiting = False
+        self._consumer = None
+        self.dispatched = 0
+        # Nivel para los medidores de la UI: uno cada AUDIO_LEVEL_EVERY chunks
+        self.level_every = max(1, Config.AUDIO_LEVEL_EVERY)
+        self._level = 0.0
+        self._last_drop_report = 0.0
+
     def start(self, loop):
         if self._running:
             return
@@ -43,6 +59,9 @@ class AudioCapturer:
             frames_per_buffer=self.chunk
         )
         
+        self._ready = asyncio.Event()
+        self._consumer = asyncio.run_coroutine_threadsafe(self._dispatch_loop(), loop)
+
         self._thread = threading.Thread(target=self._capture_loop, daemon=True)
         self._thread.start()
         print("[AudioCapturer] Started capturing audio and emitting events.")
@@ -51,6 +70,7 @@ class AudioCapturer:
         self._running = False
         if self._thread:
             self._thread.join()
+        self._wake_consumer()
         
         if self.stream:
             self.stream.stop_stream()
@@ -62,27 +82,16 @@ class AudioCapturer:
         while self._running:
             try:
                 data = self.stream.read(self.chunk, exception_on_overflow=False)
-                
-                # Calcular energía para detección de silencio/actividad
-                audio_data = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-                
-                # Aplicar Ganancia Digital (Amplificar audio bajo)
-                if Config.MIC_GAIN > 1.0:
-                    audio_data = audio_data * Config.MIC_GAIN
-                    # Clampear para evitar distorsión si se pasa de int16
-                    audio_data = np.clip(audio_data, -32768, 32767)
-                
-                # Reconvertir a bytes para enviar al bus (si se modificó)
-                if Config.MIC_GAIN > 1.0:
-                    data = audio_data.astype(np.int16).tobytes()
 
-                energy = np.sqrt(np.mean(audio_data**2))
+                # Ganancia digital (recortada a int16) y energía para detección de silencio/actividad
+                data = self.dsp.process(data)
+                energy = self.dsp.rms
 
                 # DEBUG VISUAL: Imprimir nivel de energía cada 50 chunks (aprox 1 seg)
                 self.chunks_of_silence += 1 # Usando este contador temporalmente para el print
                 if self.chunks_of_silence % 20 == 0:
                      status = "🔴" if energy < self.silence_threshold else "🟢"
-                     print(f"[Audio] Energy: {energy:.2f} | Threshold: {self.silence_threshold:.2f} {status}", end="\r")
+                     print(f"[Audio] Energy: {energy:.2f} | Peak: {self.dsp.peak:.0f} | Noise: {self.dsp.noise_floor:.2f} | Threshold: {self.silence_threshold:.2f} {status}", end="\r")
 
                 # Ajuste dinámico simple (si está activo)
                 if self.dynamic_threshold:
@@ -93,20 +102,66 @@ class AudioCapturer:
                         # Si hay silencio, bajar umbral (hasta un mínimo)
                         self.silence_threshold = max(self.silence_threshold * 0.99, 5) # Mínimo 5
                 
-                # Emitir evento de audio crudo de manera thread-safe
-                if self.loop and self.loop.is_running():
-                    asyncio.run_coroutine_threadsafe(
-                        self.bus.emit("audio_chunk", {
-                            "data": data,
-                            "energy": float(energy)
-                        }),
-                        self.loop
-                    )
+                # Dejar el chunk en el buffer; el event loop lo emitirá en orden
+                if not self.ring.write(data, energy):
+                    self._report_drops()
+                self._wake_consumer()
 
             except Exception as e:
                 print(f"[AudioCapturer] Error: {e}")
                 break
 
+    def _wake_consumer(self):
+        """Despierta a la tarea consumidora solo si está esperando (una llamada, no una por chunk)."""
+        if self._waiting and self.loop and self.loop.is_running():
+            self._waiting = False
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    def _report_drops(self):
+        now = time.monotonic()
+        if now - self._last_drop_report >= 1.0:
+            self._last_drop_report = now
+            print(f"\n[AudioCapturer] Event loop lagging: ring buffer full, {self.ring.dropped} chunks dropped so far")
+
+    async def _dispatch_loop(self):
+        """Vacía el buffer en orden y emite cada chunk al bus."""
+        while self._running:
+            item = self.ring.read()
+            if item is None:
+                # Marcar la espera antes de volver a mirar: si el productor escribe
+                # entre medias, verá _waiting y nos despertará
+                self._waiting = True
+                self._ready.clear()
+                if len(self.ring) == 0 and self._running:
+                    await self._ready.wait()
+                self._waiting = False
+                continue
+
+            data, energy = item
+            try:
+                # Canal rápido: solo listeners internos, el PCM no va a la UI
+                await self.bus.emit_fast("audio_chunk", {
+                    "data": data,
+                    "energy": energy
+                })
+            except Exception as e:
+                print(f"[AudioCapturer] Dispatch error: {e}")
+            self.dispatched += 1
+
+            # Máximo de la ventana, para que el medidor no se pierda los picos
+            self._level = max(self._level, energy)
+            if self.dispatched % self.level_every == 0:
+                await self.bus.emit("audio_level", {
+                    "energy": self._level,
+                    "peak": self.dsp.peak,
+                    "noise_floor": self.dsp.noise_floor
+                })
+                self._level = 0.0
+
+    def stats(self) -> dict:
+        """Métricas de back-pressure del buffer de audio."""
+        return {**self.ring.stats(), "dispatched": self.dispatched}
+
     def terminate(self):
         self.stop()
         self.p.terminate()
@@ -0,0 +1,82 @@
+import numpy as np
+
+INT16_MAX = 32767
+INT16_MIN = -32768
+
+
+class AudioFrontEnd:
+    """
+    Procesado por chunk del audio del micrófono (PCM 16-bit mono): ganancia, recorte,
+    RMS, pico y estimación del ruido de fondo.
+
+    Los buffers se reservan una vez para `max_samples` muestras y todas las operaciones
+    son in-place, así que procesar un chunk no crea arrays temporales (importante con
+    muchos micrófonos por máquina). Lo comparten AudioCapturer y las herramientas de
+    tools/ para que todos midan igual.
+
+    Tras cada process() quedan en el objeto:
+        raw_rms      RMS antes de la ganancia
+        rms          RMS después de la ganancia (la "energía" que usa el orquestador)
+        peak         valor absoluto máximo después de la ganancia
+        clipped      True si algún valor llegó al límite de int16
+        noise_floor  ruido de fondo estimado (sigue los mínimos del RMS)
+    """
+
+    def __init__(self, max_samples: int, gain: float = 1.0,
+                 floor_attack: float = 0.1, floor_release: float = 0.002):
+        self.max_samples = max_samples
+        self.gain = gain
+        # El ruido de fondo baja rápido hacia los silencios y sube muy despacio con la voz
+        self.floor_attack = floor_attack
+        self.floor_release = floor_release
+
+        self._f32 = np.zeros(max_samples, dtype=np.float32)
+        self._i16 = np.zeros(max_samples, dtype=np.int16)
+
+        self.raw_rms = 0.0
+        self.rms = 0.0
+        self.peak = 0.0
+        self.clipped = False
+        self.noise_floor = None
+
+    def process(self, data):
+        """
+        Procesa un chunk (bytes o array int16) y devuelve el audio listo para enviar.
+        Con ganancia es una vista del buffer interno: se sobrescribe en la siguiente
+        llamada, hay que copiarla si se guarda.
+        """
+        samples = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.int16)
+        samples = samples.reshape(-1)
+        n = min(len(samples), self.max_samples)
+        if n == 0:
+            return data
+        f32 = self._f32[:n]
+        np.copyto(f32, samples[:n], casting="unsafe")
+
+        # Producto escalar en lugar de mean(x**2): sin array temporal
+        self.raw_rms = float(np.sqrt(np.dot(f32, f32) / n))
+
+        # Como en la versión original, ganancias <= 1.0 no modifican el audio
+        if self.gain > 1.0:
+            np.multiply(f32, self.gain, out=f32)
+            np.clip(f32, INT16_MIN, INT16_MAX, out=f32)
+            self.rms = float(np.sqrt(np.dot(f32, f32) / n))
+            out = self._i16[:n]
+            np.copyto(out, f32, casting="unsafe")
+            result = memoryview(out).cast("B")
+        else:
+            self.rms = self.raw_rms
+            result = data
+
+        self.peak = float(max(f32.max(), -f32.min()))
+        self.clipped = self.peak >= INT16_MAX
+        self._track_noise_floor()
+        return result
+
+    def _track_noise_floor(self):
+        if self.noise_floor is None:
+            self.noise_floor = self.rms
+        elif self.rms < self.noise_floor:
+            self.noise_floor += (self.rms - self.noise_floor) * self.floor_attack
+        else:
+            self.noise_floor += (self.rms - self.noise_floor) * self.floor_release
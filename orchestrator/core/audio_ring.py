@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Buffer circular preasignado entre el hilo de captura (productor) y el event loop
+    (consumidor).
+
+    - Un solo productor y un solo consumidor: cada índice lo escribe un único lado, así
+      que no hace falta lock (con el GIL las asignaciones de enteros son atómicas).
+    - Memoria fija: `capacity` huecos de `chunk_bytes`. Si el loop se retrasa y el buffer
+      se llena, los chunks nuevos se descartan y se cuentan en `dropped`; nunca se
+      reordenan ni se acumulan sin límite.
+    """
+
+    def __init__(self, capacity: int, chunk_bytes: int):
+        self.capacity = max(2, capacity)
+        self.chunk_bytes = chunk_bytes
+        self._data = np.zeros((self.capacity, chunk_bytes), dtype=np.uint8)
+        self._lengths = np.zeros(self.capacity, dtype=np.int32)
+        self._energies = np.zeros(self.capacity, dtype=np.float32)
+
+        # Contadores monótonos: hueco = contador % capacity
+        self._write = 0  # solo lo toca el productor
+        self._read = 0   # solo lo toca el consumidor
+
+        # Métricas
+        self.written = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self) -> int:
+        return self._write - self._read
+
+    # --- Productor (hilo de captura) ---
+    def write(self, data: bytes, energy: float) -> bool:
+        """Copia el chunk en el siguiente hueco. False si el buffer estaba lleno."""
+        depth = self._write - self._read
+        if depth >= self.capacity:
+            self.dropped += 1
+            return False
+
+        slot = self._write % self.capacity
+        n = min(len(data), self.chunk_bytes)
+        self._data[slot, :n] = np.frombuffer(data, dtype=np.uint8, count=n)
+        self._lengths[slot] = n
+        self._energies[slot] = energy
+        # Publicar el hueco solo cuando ya está escrito
+        self._write += 1
+
+        self.written += 1
+        if depth + 1 > self.high_water:
+            self.high_water = depth + 1
+        return True
+
+    # --- Consumidor (event loop) ---
+    def read(self):
+        """(bytes, energía) del chunk más antiguo, o None si está vacío."""
+        if self._read == self._write:
+            return None
+        slot = self._read % self.capacity
+        chunk = self._data[slot, :self._lengths[slot]].tobytes()
+        energy = float(self._energies[slot])
+        # Liberar el hueco solo después de copiarlo
+        self._read += 1
+        return chunk, energy
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "depth": len(self),
+            "high_water": self.high_water,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
@@ -1,12 +1,66 @@
 import socketio
 import asyncio
+import json
+import time
 from typing import Callable, Any
+from core.metrics import LatencyHistogram
+
+# Destino de cada evento
+ROUTE_INTERNAL = "internal"  # solo listeners del orquestador
+ROUTE_UI = "ui"              # solo clientes Socket.IO (dashboard)
+ROUTE_BOTH = "both"          # ambos (por defecto)
+
+# El audio crudo (12.5 chunks/s) nunca sale del proceso; la UI recibe en su lugar el
+# nivel diezmado en "audio_level", y solo los clientes que se suscriben a él.
+DEFAULT_ROUTES = {
+    "audio_chunk": ROUTE_INTERNAL,
+    "audio_level": ROUTE_UI,
+}
+SUBSCRIPTION_EVENTS = {"audio_level"}
+
+# Cómo se ejecuta cada listener
+MODE_SEQUENTIAL = "sequential"  # se espera, en orden de registro (por defecto)
+MODE_CONCURRENT = "concurrent"  # se espera, pero en paralelo con el resto del evento
+MODE_BACKGROUND = "background"  # tarea aparte: emit() no lo espera
+
+
+class Listener:
+    """Callback registrado, con su tipo resuelto una sola vez al registrarlo."""
+
+    def __init__(self, callback: Callable, mode: str):
+        self.callback = callback
+        self.mode = mode
+        self.is_async = asyncio.iscoroutinefunction(callback)
+        self.name = getattr(callback, "__qualname__", repr(callback))
+        self.latency = LatencyHistogram()
+
 
 class EventBus:
     def __init__(self):
         self.sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
-        self.app = socketio.ASGIApp(self.sio)
+        # Las rutas HTTP que no son de Socket.IO (GET /metrics) van a _http_app
+        self.app = socketio.ASGIApp(self.sio, other_asgi_app=self._http_app)
         self.listeners = {}
+        # Por evento, listeners ya separados por modo: (secuenciales, concurrentes, background)
+        self._plans = {}
+        self.routes = dict(DEFAULT_ROUTES)
+
+        # Tiempo total de dispatch interno por evento (sin los listeners en background)
+        self.dispatch_latency = {}
+        self._background = set()
+        self._metrics_sources = {}
+
+        # Suscripción de la UI a eventos de alta frecuencia: cada evento es una sala
+        @self.sio.on('subscribe')
+        async def subscribe(sid, data):
+            for event in (data or {}).get("events", []):
+                if event in SUBSCRIPTION_EVENTS:
+                    await self.sio.enter_room(sid, event)
+
+        @self.sio.on('unsubscribe')
+        async def unsubscribe(sid, data):
+            for event in (data or {}).get("events", []):
+                await self.sio.leave_room(sid, event)
 
         # Bridge socketio events to internal listeners
         @self.sio.on('*')
@@ -14,49 +68,151 @@ class EventBus:
             # Ignorar eventos de conexión/desconexión en este catch-all si es necesario
             if event in self.listeners:
                 print(f"[EventBus] Received socket event '{event}' from frontend")
-                for callback in self.listeners[event]:
-                    if asyncio.iscoroutinefunction(callback):
-                        await callback(data)
-                    else:
-                        callback(data)
+                await self._dispatch(event, data)
+
+    def set_route(self, event: str, route: str):
+        """Cambia a quién llega un evento (ROUTE_INTERNAL, ROUTE_UI o ROUTE_BOTH)."""
+        if route not in (ROUTE_INTERNAL, ROUTE_UI, ROUTE_BOTH):
+            raise ValueError(f"Unknown route '{route}'")
+        self.routes[event] = route
+
+    async def emit_fast(self, event: str, data: Any = None):
+        """
+        Canal interno para eventos de alta frecuencia (audio): solo listeners internos,
+        sin logs ni Socket.IO.
+        """
+        if event in self.listeners:
+            await self._dispatch(event, data)
 
     async def emit(self, event: str, data: Any = None):
-        """Emite un evento a todos los clientes conectados y listeners internos."""
-        
+        """Emite un evento a los listeners internos y/o a los clientes conectados, según su ruta."""
+        route = self.routes.get(event, ROUTE_BOTH)
+        if route == ROUTE_INTERNAL:
+            await self.emit_fast(event, data)
+            return
+
         # 1. PRIORIDAD: Emitir a listeners internos PRIMERO
         # Esto asegura que el "cerebro" (Orquestador) reaccione aunque la UI (SocketIO) falle/bloquee
-        if event in self.listeners:
-            if event != "audio_chunk":
-                 print(f"[EventBus] Dispatching '{event}' to {len(self.listeners[event])} listeners")
-            for callback in self.listeners[event]:
-                try:
-                    if asyncio.iscoroutinefunction(callback):
-                        await callback(data)
-                    else:
-                        callback(data)
-                except Exception as e:
-                    print(f"[EventBus] Error in internal listener for {event}: {e}")
-        else:
-             if event != "audio_chunk":
-                 print(f"[EventBus] No internal listeners for '{event}'")
+        if route == ROUTE_BOTH:
+            if event in self.listeners:
+                print(f"[EventBus] Dispatching '{event}' to {len(self.listeners[event])} listeners")
+                await self._dispatch(event, data)
+            else:
+                print(f"[EventBus] No internal listeners for '{event}'")
 
-        # 2. Emitir a clientes socketio (UI) de forma NO BLOQUEANTE (Fire-and-forget)
-        # Usamos create_task para que si el socket cuelga, no detenga el sistema.
+        # 2. Emitir a clientes socketio (UI). Los eventos de suscripción solo van a su
+        # sala: sin suscriptores no se serializa nada.
         try:
-            await self.sio.emit(event, data)
+            if event in SUBSCRIPTION_EVENTS:
+                await self.sio.emit(event, data, room=event)
+            else:
+                await self.sio.emit(event, data)
         except Exception as e:
              print(f"[EventBus] SocketIO emit error: {e}")
 
-    def on(self, event: str, callback: Callable):
-        """Registra un listener interno para un evento."""
-        print(f"[EventBus] Registering listener for '{event}'")
+    def on(self, event: str, callback: Callable, mode: str = MODE_SEQUENTIAL):
+        """
+        Registra un listener interno para un evento.
+        mode: MODE_SEQUENTIAL, MODE_CONCURRENT o MODE_BACKGROUND (para handlers largos que
+        no deben retrasar al resto de listeners ni al siguiente chunk de audio).
+        """
+        if mode not in (MODE_SEQUENTIAL, MODE_CONCURRENT, MODE_BACKGROUND):
+            raise ValueError(f"Unknown dispatch mode '{mode}'")
+        print(f"[EventBus] Registering listener for '{event}' ({mode})")
         if event not in self.listeners:
             self.listeners[event] = []
-        self.listeners[event].append(callback)
+        self.listeners[event].append(Listener(callback, mode))
+        listeners = self.listeners[event]
+        self._plans[event] = tuple(
+            tuple(l for l in listeners if l.mode == m)
+            for m in (MODE_SEQUENTIAL, MODE_CONCURRENT, MODE_BACKGROUND)
+        )
 
     # Decorador para registrar eventos
-    def event_handler(self, event: str):
+    def event_handler(self, event: str, mode: str = MODE_SEQUENTIAL):
         def decorator(func):
-            self.on(event, func)
+            self.on(event, func, mode)
             return func
         return decorator
+
+    # --- Dispatch ---
+    async def _dispatch(self, event: str, data: Any):
+        start = time.perf_counter()
+        sequential, concurrent, background = self._plans[event]
+        for listener in background:
+            task = asyncio.create_task(self._run(event, listener, data))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+        if concurrent:
+            # La cadena secuencial cuenta como una tarea más del grupo
+            await asyncio.gather(
+                self._run_sequential(event, sequential, data),
+                *(self._run(event, listener, data) for listener in concurrent)
+            )
+        else:
+            await self._run_sequential(event, sequential, data)
+
+        histogram = self.dispatch_latency.get(event)
+        if histogram is None:
+            histogram = self.dispatch_latency[event] = LatencyHistogram()
+        histogram.observe((time.perf_counter() - start) * 1000)
+
+    async def _run_sequential(self, event: str, listeners: list, data: Any):
+        for listener in listeners:
+            await self._run(event, listener, data)
+
+    async def _run(self, event: str, listener: Listener, data: Any):
+        start = time.perf_counter()
+        try:
+            if listener.is_async:
+                await listener.callback(data)
+            else:
+                listener.callback(data)
+        except Exception as e:
+            print(f"[EventBus] Error in internal listener for {event}: {e}")
+        finally:
+            listener.latency.observe((time.perf_counter() - start) * 1000)
+
+    # --- Métricas ---
+    def add_metrics_source(self, name: str, source: Callable[[], dict]):
+        """Añade a GET /metrics el resultado de `source()` bajo la clave `name`."""
+        self._metrics_sources[name] = source
+
+    def metrics(self) -> dict:
+        data = {
+            "events": {
+                event: {
+                    "dispatch": self.dispatch_latency[event].to_dict() if event in self.dispatch_latency else None,
+                    "listeners": {
+                        listener.name: {"mode": listener.mode, **listener.latency.to_dict()}
+                        for listener in listeners
+                    },
+                }
+                for event, listeners in self.listeners.items()
+            },
+            "background_tasks": len(self._background),
+        }
+        for name, source in self._metrics_sources.items():
+            try:
+                data[name] = source()
+            except Exception as e:
+                data[name] = {"error": str(e)}
+        return data
+
+    async def _http_app(self, scope, receive, send):
+        """ASGI mínimo para GET /metrics (el resto de rutas son de Socket.IO)."""
+        if scope["type"] != "http":
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close"})
+            return
+        if scope["method"] == "GET" and scope["path"].rstrip("/") == "/metrics":
+            status, body = 200, json.dumps(self.metrics()).encode()
+        else:
+            status, body = 404, b'{"detail": "Not Found"}'
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,9 +1,11 @@
 import asyncio
+import queue
 import threading
 from config import Config
-from core.event_bus import EventBus
+from core.event_bus import EventBus, MODE_BACKGROUND
 from core.state_manager import StateManager, AppState
 from core.audio_capture import AudioCapturer
+from core.sentence_splitter import IncrementalSentenceSplitter
 from services.wake_word import WakeWordService
 from services.stt import STTServiceAdapter
 from services.rag import RAGServiceAdapter
@@ -30,12 +32,18 @@ class VoiceOrchestrator:
         # Registrar eventos
         self.bus.on("wakeword_detected", self.handle_wakeword)
         self.bus.on("audio_chunk", self.handle_audio)
+        self.bus.on("speech_endpoint", self.handle_speech_endpoint)
         
         # Eventos de Debug / Control Manual
+        # Los que hablan o consultan el RAG duran segundos: en background para no
+        # bloquear el handler de Socket.IO ni al resto de listeners
         self.bus.on("manual_listen", self.handle_manual_listen)
-        self.bus.on("process_text", self.handle_process_text)
-        self.bus.on("speak_text", self.handle_speak_text)
-        self.bus.on("query_rag", self.handle_query_rag)
+        self.bus.on("process_text", self.handle_process_text, mode=MODE_BACKGROUND)
+        self.bus.on("speak_text", self.handle_speak_text, mode=MODE_BACKGROUND)
+        self.bus.on("query_rag", self.handle_query_rag, mode=MODE_BACKGROUND)
+
+        # Métricas del buffer de audio en GET /metrics
+        self.bus.add_metrics_source("audio", self.capturer.stats)
 
     def start(self):
         """Inicia el orquestador."""
@@ -83,6 +91,14 @@ class VoiceOrchestrator:
                 # Disparar el procesamiento en una tarea separada para no bloquear
                 asyncio.create_task(self.process_interaction())
 
+    async def handle_speech_endpoint(self, data):
+        """El VAD del servicio STT detectó fin de frase: cortar sin esperar al contador de silencio."""
+        if self.state_manager.get_state() != AppState.LISTENING_USER:
+            return
+        print("[Orchestrator] STT endpoint detected, finishing speech capture.")
+        self._silence_counter = 0
+        asyncio.create_task(self.process_interaction())
+
     async def handle_wakeword(self, data):
         """Manejador disparado cuando se detecta la palabra clave."""
         print(f"[Orchestrator] handle_wakeword triggered. State: {self.state_manager.get_state()}")
@@ -131,6 +147,50 @@ class VoiceOrchestrator:
             response = await asyncio.to_thread(self.rag_service.query, text)
             await self.bus.emit("rag_response", {"text": response})
 
+    def answer_and_speak(self, text: str) -> str:
+        """
+        Puente token -> voz (bloqueante, se ejecuta en un hilo).
+        Un hilo lee la respuesta del RAG según se genera y la corta en frases; este hilo
+        las va enviando al TTS mientras las anteriores suenan. El tiempo hasta la primera
+        palabra depende de la primera frase, no de la respuesta completa.
+        Devuelve la respuesta completa.
+        """
+        sentences = queue.Queue()
+        parts = []
+        spoken = []
+
+        def push(sentence):
+            if not spoken:
+                self._set_state_threadsafe(AppState.SPEAKING)
+            spoken.append(sentence)
+            sentences.put(sentence)
+            # Texto parcial para la UI, una vez por frase (no por token)
+            self._emit_threadsafe("rag_partial", {"text": " ".join(spoken)})
+
+        def produce():
+            splitter = IncrementalSentenceSplitter()
+            try:
+                for token in self.rag_service.query_stream(text):
+                    parts.append(token)
+                    for sentence in splitter.feed(token):
+                        push(sentence)
+                for sentence in splitter.flush():
+                    push(sentence)
+            finally:
+                sentences.put(None)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        self.tts_service.speak_queue(sentences)
+        producer.join()
+        return "".join(parts)
+
+    def _emit_threadsafe(self, event, data):
+        asyncio.run_coroutine_threadsafe(self.bus.emit(event, data), self._loop)
+
+    def _set_state_threadsafe(self, state):
+        asyncio.run_coroutine_threadsafe(self.state_manager.set_state(state), self._loop)
+
     async def process_interaction(self, text=None):
         """Coordina el procesamiento del audio capturado o texto inyectado."""
         if self.state_manager.get_state() != AppState.LISTENING_USER:
@@ -151,14 +211,19 @@ class VoiceOrchestrator:
             print(f"[Orchestrator] User said: {text}")
             await self.bus.emit("transcription_final", {"text": text})
 
-            # 2. Consultar RAG
-            response_text = await asyncio.to_thread(self.rag_service.query, text)
-            await self.bus.emit("rag_response", {"text": response_text})
-
-            # 3. Sintetizar respuesta (TTS)
-            await self.state_manager.set_state(AppState.SPEAKING)
-            # Enviar feedback de voz
-            await asyncio.to_thread(self.tts_service.speak, response_text)
+            if Config.RAG_STREAMING:
+                # 2+3. Consultar RAG y hablar cada frase en cuanto está completa
+                response_text = await asyncio.to_thread(self.answer_and_speak, text)
+                await self.bus.emit("rag_response", {"text": response_text})
+            else:
+                # 2. Consultar RAG
+                response_text = await asyncio.to_thread(self.rag_service.query, text)
+                await self.bus.emit("rag_response", {"text": response_text})
+
+                # 3. Sintetizar respuesta (TTS)
+                await self.state_manager.set_state(AppState.SPEAKING)
+                # Enviar feedback de voz
+                await asyncio.to_thread(self.tts_service.speak, response_text)
 
             # 4. Volver a esperar
             print("[Orchestrator] Resuming wake word detection.")
@@ -0,0 +1,76 @@
+import re
+
+# Mismos límites que services/tts/app/text_processing.py
+TARGET_LENGTH = 85   # Tamaño ideal de cada frase (límite blando)
+MAX_LENGTH = 140     # Máximo absoluto (límite duro)
+MIN_LENGTH = 20      # Evita frases demasiado cortas al principio
+
+# Un terminador solo cuenta cuando ya llegó el espacio siguiente ("3.5" o "Sr.X" no cortan)
+_SENTENCE_END = re.compile(r'[.!?]+\s+|\n+')
+_CLAUSE_END = re.compile(r'[,;:]\s+')
+
+
+def find_split_point(text: str) -> int:
+    """
+    Punto de corte para un texto más largo que MAX_LENGTH, con las mismas prioridades
+    que split_into_sentences del servicio TTS: fin de oración -> fin de cláusula ->
+    espacio -> corte duro.
+    """
+    window = text[:MAX_LENGTH]
+
+    # Prioridad 1: fin de oración (el último, para aprovechar el tamaño)
+    matches = list(_SENTENCE_END.finditer(window))
+    if matches:
+        return matches[-1].end()
+
+    # Prioridad 2: fin de cláusula (coma, punto y coma)
+    matches = [m for m in _CLAUSE_END.finditer(window) if m.end() > MIN_LENGTH]
+    if matches:
+        return matches[-1].end()
+
+    # Prioridad 3: espacio
+    last_space = text.rfind(' ', 0, MAX_LENGTH)
+    if last_space > MIN_LENGTH:
+        return last_space + 1
+
+    # Último recurso: palabra gigante
+    return MAX_LENGTH
+
+
+class IncrementalSentenceSplitter:
+    """
+    Versión incremental de split_into_sentences para texto que llega token a token.
+
+    feed() devuelve las frases que ya están completas: en cuanto hay un fin de oración
+    confirmado (después de MIN_LENGTH caracteres) o el buffer supera MAX_LENGTH.
+    flush() devuelve lo que quede al terminar el stream.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        sentences = []
+
+        while len(self._buffer) > MAX_LENGTH:
+            sentences.append(self._cut(find_split_point(self._buffer)))
+
+        # Cortar en el último fin de oración ya confirmado
+        split_point = -1
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.end() > MIN_LENGTH:
+                split_point = match.end()
+        if split_point != -1:
+            sentences.append(self._cut(split_point))
+
+        return [s for s in sentences if s]
+
+    def flush(self) -> list:
+        rest = self._cut(len(self._buffer))
+        return [rest] if rest else []
+
+    def _cut(self, split_point: int) -> str:
+        sentence = self._buffer[:split_point].strip()
+        self._buffer = self._buffer[split_point:].lstrip()
+        return sentence
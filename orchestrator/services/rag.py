@@ -1,33 +1,70 @@
+import json
 import requests
 from config import Config
 
 class RAGServiceAdapter:
     def __init__(self):
         self.uri = Config.RAG_URI
+        self.stream_uri = Config.RAG_STREAM_URI
 
     def query(self, text: str) -> str:
         """Envía una pregunta al servicio RAG y retorna la respuesta."""
         if not text:
             return ""
-            
+
         print(f"[RAGService] Querying: {text}...")
         try:
-            params = {"query": text} 
-            
+            params = {"query": text}
+
             response = requests.get(self.uri, params=params)
             response.raise_for_status()
-            
+
             data = response.json()
             answer = data.get("answer", data.get("response", ""))
-            
+
             print(f"[RAGService] Answer: {answer[:50]}...")
             return answer
-        except requests.exceptions.HTTPError as e:
+        except Exception as e:
+            return self._error_message(e)
+
+    def query_stream(self, text: str):
+        """
+        Igual que query() pero entrega la respuesta por fragmentos a medida que el LLM
+        la genera (endpoint /ask/stream, NDJSON).
+        """
+        if not text:
+            return
+
+        print(f"[RAGService] Streaming query: {text}...")
+        emitted = False
+        try:
+            with requests.get(self.stream_uri, params={"query": text}, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("type") == "token":
+                        emitted = True
+                        yield event["text"]
+                    elif event.get("type") == "error":
+                        raise RuntimeError(event.get("detail"))
+                    elif event.get("type") == "done":
+                        print(f"[RAGService] Answer: {event.get('answer', '')[:50]}...")
+        except Exception as e:
+            message = self._error_message(e)
+            # Si ya se dijo parte de la respuesta no se añade el mensaje de error
+            if not emitted:
+                yield message
+
+    @staticmethod
+    def _error_message(e: Exception) -> str:
+        """Mensaje hablado para cada tipo de fallo del servicio RAG."""
+        if isinstance(e, requests.exceptions.HTTPError):
             if e.response.status_code == 400:
                 print("[RAGService] Knowledge Base likely empty or missing collection.")
                 return "No tengo información en mi cerebro aún. Por favor sube documentos en el Dashboard."
             print(f"[RAGService] HTTP Error: {e}")
             return "Tuve un error de conexión con mi cerebro."
-        except Exception as e:
-            print(f"[RAGService] Error: {e}")
-            return "Lo siento, tuve un problema al consultar mi base de conocimientos."
+        print(f"[RAGService] Error: {e}")
+        return "Lo siento, tuve un problema al consultar mi base de conocimientos."
@@ -12,6 +12,8 @@ class STTServiceAdapter:
         self.websocket = None
         self._connected = False
         self._bytes_sent = 0
+        self._receiver_task = None
+        self._final_result = None
 
     async def connect(self):
         try:
@@ -22,18 +24,44 @@ class STTServiceAdapter:
             import os
             if os.path.exists("debug_sent_audio.raw"):
                 os.remove("debug_sent_audio.raw")
+
+            start_message = {"action": "start", "streaming": Config.STT_STREAMING}
+            if Config.STT_PROFILE:
+                start_message["profile"] = Config.STT_PROFILE
+            await self.websocket.send(json.dumps(start_message))
+            self._final_result = asyncio.get_running_loop().create_future()
+            self._receiver_task = asyncio.create_task(self._receive_loop())
             print("[STTService] Connected to WebSocket.")
         except Exception as e:
             print(f"[STTService] Connection failed: {e}")
             self._connected = False
 
+    async def _receive_loop(self):
+        """Lee mensajes del STT: los parciales se publican en el bus, el final resuelve el futuro."""
+        try:
+            async for message in self.websocket:
+                data = json.loads(message)
+                if "partial" in data:
+                    await self.bus.emit("transcription_partial", {"text": data["partial"], "stable": data.get("stable", "")})
+                elif data.get("event") == "endpoint":
+                    # El VAD del STT detectó fin de frase
+                    await self.bus.emit("speech_endpoint", {})
+                elif "transcript" in data or "error" in data:
+                    if not self._final_result.done():
+                        self._final_result.set_result(data)
+        except Exception as e:
+            print(f"[STTService] Receive loop ended: {e}")
+        finally:
+            if self._final_result and not self._final_result.done():
+                self._final_result.set_result({})
+
     async def send_audio(self, audio_chunk: bytes):
         if not self._connected or not self.websocket:
             return
         try:
             await self.websocket.send(audio_chunk)
             self._bytes_sent += len(audio_chunk)
-            
+
             # DEBUG: Save to local file to verify what we are sending
             with open("debug_sent_audio.raw", "ab") as f:
                 f.write(audio_chunk)
@@ -44,20 +72,30 @@ class STTServiceAdapter:
     async def stop_and_get_result(self) -> str:
         if not self._connected or not self.websocket:
             return ""
-        
+
         try:
             print(f"[STTService] Sending stop signal... (Sent {self._bytes_sent} bytes total)")
             await self.websocket.send(json.dumps({"action": "stop"}))
-            response = await self.websocket.recv()
-            data = json.loads(response)
+            data = await asyncio.wait_for(self._final_result, timeout=Config.STT_RESULT_TIMEOUT)
+            if "error" in data:
+                print(f"[STTService] STT error: {data['error']}")
             transcription = data.get("transcript", "")
             print(f"[STTService] Transcription received: {transcription}")
-            
-            await self.websocket.close()
-            self._connected = False
-            self.websocket = None
-            
             return transcription
         except Exception as e:
             print(f"[STTService] Error receiving result: {e}")
             return ""
+        finally:
+            await self._close()
+
+    async def _close(self):
+        try:
+            if self.websocket:
+                await self.websocket.close()
+        except Exception:
+            pass
+        if self._receiver_task:
+            self._receiver_task.cancel()
+            self._receiver_task = None
+        self._connected = False
+        self.websocket = None
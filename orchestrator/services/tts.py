@@ -1,3 +1,7 @@
+import queue
+import struct
+import subprocess
+import threading
 import requests
 import pyaudio
 from config import Config
@@ -14,40 +18,150 @@ class TTSServiceAdapter:
 
         print(f"[TTSService] Speaking: {text[:30]}...")
         try:
-            payload = {
-                "text": text,
-                "stream": True
-            }
-            if Config.TTS_VOICE_FILE:
-                payload["voice_sample"] = Config.TTS_VOICE_FILE
-            # Puede ser endpoint de stream o batch. Config apunta a stream.
-            
-            with requests.post(self.uri, json=payload, stream=True) as response:
-                response.raise_for_status()
+            with self._request(text) as response:
                 self._play_stream(response)
-                
+
+        except Exception as e:
+            print(f"[TTSService] Error: {e}")
+
+    def speak_queue(self, sentences: queue.Queue):
+        """
+        Reproduce las frases de la cola a medida que llegan, hasta recibir None.
+        Un hilo aparte pide cada frase al TTS en cuanto está completa, también mientras
+        suena la anterior, así que entre frases no hay que esperar al primer byte.
+        """
+        # Respuestas ya abiertas esperando turno. Acotada: el hilo de peticiones va como
+        # mucho una frase en cola (más la que tiene abierta) por delante de la reproducción.
+        responses = queue.Queue(maxsize=1)
+        fetcher = threading.Thread(target=self._fetch_responses, args=(sentences, responses), daemon=True)
+        fetcher.start()
+
+        while True:
+            response = responses.get()
+            if response is None:
+                break
+            self._play_and_close(response)
+        fetcher.join()
+
+    def _fetch_responses(self, sentences: queue.Queue, responses: queue.Queue):
+        """Abre la petición de cada frase y la deja en `responses`; None al terminar."""
+        try:
+            while True:
+                sentence = sentences.get()
+                if sentence is None:
+                    break
+
+                print(f"[TTSService] Speaking: {sentence[:30]}...")
+                try:
+                    responses.put(self._request(sentence))
+                except Exception as e:
+                    print(f"[TTSService] Error: {e}")
+        finally:
+            responses.put(None)
+
+    def _request(self, text: str):
+        """Abre la petición de streaming; el servicio empieza a sintetizar en cuanto llega."""
+        payload = {
+            "text": text,
+            "stream": True,
+            "format": Config.TTS_FORMAT
+        }
+        if Config.TTS_VOICE_FILE:
+            payload["voice_sample"] = Config.TTS_VOICE_FILE
+        if Config.TTS_SAMPLE_RATE:
+            payload["sample_rate"] = Config.TTS_SAMPLE_RATE
+        # Puede ser endpoint de stream o batch. Config apunta a stream.
+
+        response = requests.post(self.uri, json=payload, stream=True)
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def _play_and_close(self, response):
+        try:
+            self._play_stream(response)
         except Exception as e:
             print(f"[TTSService] Error: {e}")
+        finally:
+            response.close()
 
     def _play_stream(self, response):
         """Reproduce el stream de audio chunk por chunk."""
-        # Asumiendo formato WAV/PCM compatible.
-        # En una implementación real robusta, se debería parsear el header WAV 
-        # o usar ffmpeg para decodificar al vuelo si es MP3/Opus.
-        # Por simplicidad y asumiendo servicio local devuelve WAV stream:
-        
+        # El servicio anuncia el formato en las cabeceras X-Audio-*.
+        # Si no vienen (versiones antiguas), se asume PCM 16-bit mono a 24 kHz.
+        audio_format = response.headers.get("X-Audio-Format", "pcm")
+        rate = int(response.headers.get("X-Audio-Sample-Rate", "24000"))
+        channels = int(response.headers.get("X-Audio-Channels", "1"))
+
+        chunks = response.iter_content(chunk_size=1024)
+        if audio_format == "wav":
+            chunks, rate, channels = self._skip_wav_header(chunks)
+        elif audio_format == "opus":
+            chunks = self._decode_opus(chunks, rate, channels)
+
         stream = self.p.open(
             format=pyaudio.paInt16,
-            channels=1,
-            rate=24000, # XTTS suele ser 24k
+            channels=channels,
+            rate=rate,
             output=True,
             output_device_index=Config.OUTPUT_DEVICE_INDEX
         )
 
         try:
-            for chunk in response.iter_content(chunk_size=1024):
+            for chunk in chunks:
                 if chunk:
                     stream.write(chunk)
         finally:
             stream.stop_stream()
             stream.close()
+
+    @staticmethod
+    def _skip_wav_header(chunks):
+        """Lee la cabecera WAV (44 bytes) del stream y devuelve (resto del audio, rate, canales)."""
+        header = b""
+        for chunk in chunks:
+            header += chunk
+            if len(header) >= 44:
+                break
+        _, channels, rate = struct.unpack("<HHI", header[20:28])
+
+        def rest():
+            yield header[44:]
+            yield from chunks
+
+        return rest(), rate, channels
+
+    @staticmethod
+    def _decode_opus(chunks, rate, channels):
+        """Decodifica Ogg/Opus a PCM 16-bit al vuelo con ffmpeg."""
+        decoder = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-f", "ogg", "-i", "pipe:0",
+             "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+
+        def feed():
+            try:
+                for chunk in chunks:
+                    decoder.stdin.write(chunk)
+            except (BrokenPipeError, requests.RequestException) as e:
+                print(f"[TTSService] Opus stream interrupted: {e}")
+            finally:
+                decoder.stdin.close()
+
+        threading.Thread(target=feed, daemon=True).start()
+        try:
+            # ~20 ms de audio por lectura
+            block = int(rate * channels * 2 * 0.02)
+            while True:
+                pcm = decoder.stdout.read1(block)
+                if not pcm:
+                    break
+                yield pcm
+        finally:
+            decoder.kill()
+            decoder.wait()
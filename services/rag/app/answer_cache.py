@@ -0,0 +1,127 @@
+import time
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Caché de respuestas por similitud de la pregunta.
+
+    Guarda (embedding de la pregunta, respuesta, fuentes, versión de la colección) y
+    devuelve la respuesta guardada cuando llega una pregunta cuyo embedding tiene una
+    similitud coseno >= `threshold` con una anterior hecha con los mismos parámetros.
+
+    - Las entradas caducan a los `ttl` segundos; si se llena, se descarta la menos usada.
+    - invalidate() sube la versión de la colección: todo lo guardado deja de servir
+      (se llama desde /ingest y /purge).
+    - Los embeddings se guardan normalizados en una matriz float32 preasignada, así una
+      búsqueda es un único producto matriz-vector.
+    - Solo se usa desde el event loop, no necesita locks.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(0, max_entries)
+        self.version = 0
+
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim)
+        self._entries: List[Optional[dict]] = []
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # --- API ---
+    def get(self, vector, params: Hashable) -> Optional[dict]:
+        """Entrada más parecida ({answer, sources, query, similarity}) o None."""
+        if not self.enabled or self._matrix is None or not self._entries:
+            self._misses += 1
+            return None
+
+        query = self._normalize(vector)
+        sims = self._matrix[:len(self._entries)] @ query
+        now = time.monotonic()
+        for slot in np.argsort(-sims):
+            if sims[slot] < self.threshold:
+                break
+            entry = self._entries[slot]
+            if entry is None or entry["params"] != params:
+                continue
+            if entry["version"] != self.version or now - entry["created"] > self.ttl:
+                self._entries[slot] = None  # hueco reutilizable
+                continue
+            entry["last_used"] = now
+            self._hits += 1
+            return {
+                "answer": entry["answer"],
+                "sources": entry["sources"],
+                "query": entry["query"],
+                "similarity": float(sims[slot]),
+            }
+
+        self._misses += 1
+        return None
+
+    def put(self, vector, params: Hashable, query: str, answer: str, sources: list):
+        if not self.enabled or not answer:
+            return
+        vec = self._normalize(vector)
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+
+        slot = self._free_slot()
+        self._matrix[slot] = vec
+        now = time.monotonic()
+        entry = {
+            "params": params,
+            "query": query,
+            "answer": answer,
+            "sources": sources,
+            "version": self.version,
+            "created": now,
+            "last_used": now,
+        }
+        if slot == len(self._entries):
+            self._entries.append(entry)
+        else:
+            self._entries[slot] = entry
+
+    def invalidate(self):
+        """La colección cambió: descarta todas las respuestas guardadas."""
+        self.version += 1
+        self._entries = []
+
+    def stats(self) -> dict:
+        return {
+            "entries": sum(1 for e in self._entries if e is not None),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "version": self.version,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+    # --- Internos ---
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _free_slot(self) -> int:
+        for slot, entry in enumerate(self._entries):
+            if entry is None:
+                return slot
+        if len(self._entries) < self.max_entries:
+            return len(self._entries)
+
+        # Llena: la caducada o, si no hay, la menos usada recientemente
+        now = time.monotonic()
+        for slot, entry in enumerate(self._entries):
+            if entry["version"] != self.version or now - entry["created"] > self.ttl:
+                return slot
+        return min(range(len(self._entries)), key=lambda slot: self._entries[slot]["last_used"])
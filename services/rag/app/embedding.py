@@ -0,0 +1,137 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    Embeddings fuera del event loop, agrupados en micro-lotes.
+
+    - Todas las llamadas al modelo se ejecutan en un hilo dedicado, así /health y el
+      resto de peticiones siguen respondiendo mientras se codifica.
+    - Las consultas que llegan con menos de `window` segundos de diferencia se codifican
+      juntas en una sola llamada a `encode_fn` (hasta `max_batch`), que en CPU es mucho
+      más eficiente que una llamada por texto.
+    - Las consultas repetidas salen de una caché LRU de `cache_size` entradas, y las
+      idénticas en vuelo comparten el mismo resultado.
+    - Si `encode_fn` devuelve (densos, dispersos), los dos se guardan juntos y
+      encode_hybrid() da ambos sin volver a pasar por el modelo.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch: int = 32,
+        window: float = 0.005,
+        cache_size: int = 256,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window)
+        self.cache_size = max(0, cache_size)
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # texto -> (vector denso, vector disperso o None)
+        self._cache: "OrderedDict[str, Tuple[np.ndarray, Any]]" = OrderedDict()
+        self._batches = 0
+        self._encoded = 0
+
+    # --- API ---
+    async def encode(self, text: str) -> List[float]:
+        """Vector de una consulta (caché -> lote en curso -> nuevo lote)."""
+        vec, _ = await self._lookup(text)
+        return vec.tolist()
+
+    async def encode_hybrid(self, text: str) -> Tuple[List[float], Any]:
+        """(vector denso, vector disperso) de una consulta; el disperso es None si `encode_fn` no lo da."""
+        vec, sparse = await self._lookup(text)
+        return vec.tolist(), sparse
+
+    async def run(self, fn, *args):
+        """Ejecuta otro trabajo del modelo en el mismo hilo dedicado."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._cache),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches": self._batches,
+            "encoded": self._encoded,
+        }
+
+    async def aclose(self):
+        if self._worker:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internos ---
+    async def _lookup(self, text: str) -> Tuple[np.ndarray, Any]:
+        entry = self._cache.get(text)
+        if entry is not None:
+            self._cache.move_to_end(text)
+            return entry
+
+        future = self._in_flight.get(text)
+        if future is None:
+            self._ensure_worker()
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[text] = future
+            self._queue.put_nowait((text, future))
+        return await asyncio.shield(future)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._worker = asyncio.create_task(self._run_batches())
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batches(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self.run(self.encode_fn, texts)
+                sparse = [None] * len(texts)
+                if isinstance(vectors, tuple):
+                    vectors, sparse = vectors
+                self._batches += 1
+                self._encoded += len(texts)
+                for (text, future), vec, sparse_vec in zip(batch, vectors, sparse):
+                    entry = (np.asarray(vec, dtype=np.float32), sparse_vec)
+                    self._remember(text, entry)
+                    if not future.done():
+                        future.set_result(entry)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for text in texts:
+                    self._in_flight.pop(text, None)
+
+    def _remember(self, text: str, entry: Tuple[np.ndarray, Any]):
+        if self.cache_size == 0:
+            return
+        self._cache[text] = entry
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
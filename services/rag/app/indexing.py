@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def encode_chunks(model, texts: Sequence[str], batch_size: int = 32, cache=None) -> np.ndarray:
+    """
+    Codifica los chunks de la ingesta por lotes de `batch_size`.
+
+    Los textos se ordenan por longitud antes de formar los lotes, así cada lote junta
+    textos de tamaño parecido y apenas hay padding; el resultado vuelve al orden original.
+    No pasa por la caché de consultas; con `cache` (EmbeddingCache) solo se codifican
+    los chunks que no estén ya en la caché persistente.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if cache is not None:
+        return cache.encode(texts, lambda missing: encode_chunks(model, missing, batch_size))
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    vectors = None
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        batch = model.encode([texts[i] for i in idx], batch_size=batch_size)
+        if vectors is None:
+            vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+        vectors[idx] = batch
+    return vectors
+
+
+def encode_chunks_hybrid(model, texts: Sequence[str], batch_size: int = 32, cache=None) -> Tuple[np.ndarray, List]:
+    """
+    Como encode_chunks, pero con vectores densos y dispersos de la misma pasada de
+    BGE-M3 (`model` es un HybridEncoder). La caché solo guarda densos, así que aquí se
+    codifica todo; los densos se guardan igualmente para consultas e ingestas futuras.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32), []
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    vectors = None
+    sparse = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        dense, lexical = model.encode_hybrid([texts[i] for i in idx], batch_size=batch_size)
+        if vectors is None:
+            vectors = np.empty((len(texts), dense.shape[1]), dtype=np.float32)
+        vectors[idx] = dense
+        for i, weights in zip(idx, lexical):
+            sparse[i] = weights
+
+    if cache is not None:
+        cache.put_many({cache.key(text): vec for text, vec in zip(texts, vectors)})
+    return vectors, sparse
+
+
+def upsert_points(client, collection: str, points: List, batch_size: int = 256, parallel: int = 4) -> int:
+    """Sube los puntos a Qdrant en lotes de `batch_size`, con hasta `parallel` peticiones a la vez."""
+    batches = [points[i:i + batch_size] for i in range(0, len(points), batch_size)]
+    if len(batches) <= 1 or parallel <= 1:
+        for batch in batches:
+            client.upsert(collection_name=collection, points=batch)
+        return len(points)
+
+    with ThreadPoolExecutor(max_workers=min(parallel, len(batches))) as pool:
+        # list() para propagar la primera excepción
+        list(pool.map(lambda batch: client.upsert(collection_name=collection, points=batch), batches))
+    return len(points)
@@ -1,78 +1,38 @@
-import os, re, hashlib, time, argparse
+import os, time, argparse, json, queue, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
-from qdrant_client import QdrantClient, models
-from sentence_transformers import SentenceTransformer
+from indexing import encode_chunks, encode_chunks_hybrid
+from vector_cache import open_cache
+from parsing import READERS, file_sha1, point_id, parse_document
 
 # ---- Config ----
 QDRANT_URL = os.getenv("QDRANT_HOST", "http://localhost:6333")
 COLLECTION = "docs"
 EMBED_MODEL_NAME = "BAAI/bge-m3"  # 1024 dims
-CHUNK_SIZE = 800
-CHUNK_OVERLAP = 150
+# Misma caché persistente que main.py: reindexar chunks ya vistos no vuelve a embeberlos
+EMBED_DISK_CACHE = os.getenv("EMBED_DISK_CACHE", "/cache/embeddings.sqlite")
+EMBED_DISK_CACHE_DTYPE = os.getenv("EMBED_DISK_CACHE_DTYPE", "float16")
+EMBED_DISK_CACHE_MAX = int(os.getenv("EMBED_DISK_CACHE_MAX", "100000"))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "false").lower() in ("1", "true", "yes")
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "32"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+UPSERT_PARALLEL = int(os.getenv("UPSERT_PARALLEL", "4"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+PROGRESS_EVERY = 5.0  # segundos entre informes de progreso
+MANIFEST_NAME = ".ingest_manifest.json"  # Se guarda en la carpeta indexada salvo --manifest
 
 # ---- Conexiones ----
-qdrant = QdrantClient(url=QDRANT_URL)
-embed_model = SentenceTransformer(EMBED_MODEL_NAME)
-
-
-# ---- Utilidades ----
-def sha1(s: str) -> str:
-    return hashlib.sha1(s.encode("utf-8", errors="ignore")).hexdigest()
-
-def norm_ws(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
-
-def chunk_text(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    words = text.split()
-    if not words:
-        return []
-    chunks = []
-    i = 0
-    while i < len(words):
-        chunk = " ".join(words[i:i+size])
-        chunks.append(chunk)
-        i += size - overlap
-        if i < 0: break
-    return chunks
-
-# ---- Loaders por tipo ----
-def read_txt(p: Path) -> str:
-    import chardet
-    data = p.read_bytes()
-    enc = chardet.detect(data).get("encoding") or "utf-8"
-    return data.decode(enc, errors="ignore")
-
-def read_md(p: Path) -> str:
-    return read_txt(p)
-
-def read_pdf(p: Path) -> str:
-    from pypdf import PdfReader
-    reader = PdfReader(str(p))
-    return "\n".join(page.extract_text() or "" for page in reader.pages)
-
-def read_docx(p: Path) -> str:
-    import docx
-    doc = docx.Document(str(p))
-    return "\n".join(par.text for par in doc.paragraphs)
-
-def read_html(p: Path) -> str:
-    from bs4 import BeautifulSoup
-    html = read_txt(p)
-    soup = BeautifulSoup(html, "html.parser")
-    # Opcional: quita scripts/estilos
-    for tag in soup(["script","style","noscript"]):
-        tag.decompose()
-    return soup.get_text(separator=" ")
-
-READERS = {
-    ".txt": read_txt,
-    ".md": read_md,
-    ".pdf": read_pdf,
-    ".docx": read_docx,
-    ".html": read_html,
-    ".htm": read_html,
-}
+# Se abren en main(), y también ahí se importan torch, sentence_transformers y
+# qdrant_client: los procesos de parseo vuelven a importar este módulo (como
+# __mp_main__) y solo deben cargar parsing.py.
+models = None  # qdrant_client.models
+sparse = None  # módulo sparse.py (importa qdrant_client)
+qdrant = None
+embed_model = None
+vector_cache = None
+hybrid_encoder = None  # Solo con --hybrid y si la colección tiene el vector disperso
+
 
 def discover_files(root: Path):
     exts = set(READERS.keys())
@@ -85,53 +45,192 @@ def ensure_collection():
         qdrant.create_collection(
             collection_name=COLLECTION,
             vectors_config=models.VectorParams(size=1024, distance=models.Distance.COSINE),
+            sparse_vectors_config=sparse.sparse_vectors_config() if hybrid_encoder else None,
         )
 
-def upsert_document(path: Path, base_dir: Path):
-    ext = path.suffix.lower()
-    reader = READERS.get(ext)
-    if not reader:
-        print(f"[skip] Extensión no soportada: {path.name}")
-        return 0
+# ---- Pipeline: parseo (procesos) -> embeddings (lotes entre documentos) -> upsert (hilos) ----
+def parse_all(paths, base_dir: Path, workers: int):
+    """
+    Parsea los documentos en un pool de `workers` procesos y los devuelve según terminan.
+    Como mucho hay 2*workers documentos en vuelo, así la memoria no crece con el corpus
+    si el embedding va más lento que el parseo.
+    """
+    if workers <= 1:
+        for p in paths:
+            yield parse_document(str(p), str(base_dir))
+        return
 
-    try:
-        raw = reader(path)
-    except Exception as e:
-        print(f"[error] Leyendo {path.name}: {e}")
-        return 0
-
-    text = norm_ws(raw)
-    if not text:
-        print(f"[skip] Vacío: {path.name}")
-        return 0
-
-    rel_path = str(path.relative_to(base_dir))
-    doc_id = sha1(rel_path)  # id estable por ruta relativa
-    mtime = int(path.stat().st_mtime)
-
-    chunks = chunk_text(text)
-    if not chunks:
-        print(f"[skip] Sin chunks: {path.name}")
-        return 0
-
-    points = []
-    for idx, chunk in enumerate(chunks):
-        vec = embed_model.encode(chunk).tolist()
-        pid = int(sha1(f"{doc_id}-{idx}")[:16], 16)  # entero estable a partir de hash
+    paths = iter(paths)
+    ctx = multiprocessing.get_context("spawn")  # fork no es seguro con torch cargado
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        in_flight = set()
+        while True:
+            for p in paths:
+                in_flight.add(pool.submit(parse_document, str(p), str(base_dir)))
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+class Upserter:
+    """
+    Sube puntos y borrados a Qdrant desde `parallel` hilos, en lotes de `batch_size`.
+    La cola está acotada: si Qdrant va lento, add() bloquea y frena el embedding.
+    """
+
+    def __init__(self, batch_size=UPSERT_BATCH_SIZE, parallel=UPSERT_PARALLEL):
+        self.batch_size = max(1, batch_size)
+        self._pending = []
+        self._queue = queue.Queue(maxsize=max(1, parallel) * 2)
+        self._error = None
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True, name=f"upsert-{i}")
+            for i in range(max(1, parallel))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def add(self, point):
+        self._pending.append(point)
+        if len(self._pending) >= self.batch_size:
+            self._put(("upsert", self._pending))
+            self._pending = []
+
+    def delete(self, ids):
+        if ids:
+            self._put(("delete", ids))
+
+    def close(self):
+        """Vacía lo pendiente, espera a los hilos y relanza el primer error."""
+        if self._pending:
+            self._put(("upsert", self._pending))
+            self._pending = []
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        if self._error:
+            raise self._error
+
+    def _put(self, item):
+        if self._error:
+            raise self._error
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error:
+                continue  # ya falló: solo se drena la cola
+            op, data = item
+            try:
+                if op == "upsert":
+                    qdrant.upsert(collection_name=COLLECTION, points=data)
+                else:
+                    delete_points(data)
+            except Exception as e:
+                self._error = e
+
+
+class Progress:
+    def __init__(self, every=PROGRESS_EVERY):
+        self.every = every
+        self.start = self._last = time.perf_counter()
+        self.docs = self.chunks = 0
+
+    def add(self, docs=0, chunks=0):
+        self.docs += docs
+        self.chunks += chunks
+        now = time.perf_counter()
+        if now - self._last >= self.every:
+            self._last = now
+            print(f"[progress] {self.report()}")
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"{self.docs} docs, {self.chunks} chunks en {elapsed:.1f}s "
+                f"({self.docs / elapsed:.1f} docs/s, {self.chunks / elapsed:.1f} chunks/s)")
+
+
+def embed_documents(docs, upserter: Upserter, batch_size=EMBED_BATCH_SIZE, reembed=False):
+    """
+    Embebe los chunks nuevos o modificados de varios documentos a la vez y los pasa al
+    upserter. Devuelve [(doc, chunks subidos)].
+    Con `doc["previous"]` (su entrada anterior del manifiesto) y sin `reembed`, solo se
+    re-embeben los chunks cuyo texto cambió.
+    """
+    work = []  # (doc, idx)
+    for doc in docs:
+        old_hashes = doc["previous"]["chunks"] if doc["previous"] else []
+        work.extend(
+            (doc, idx) for idx, h in enumerate(doc["chunk_hashes"])
+            if reembed or idx >= len(old_hashes) or old_hashes[idx] != h
+        )
+
+    texts = [doc["chunks"][idx] for doc, idx in work]
+    sparse_vectors = None
+    if hybrid_encoder:
+        # Densos y pesos léxicos de la misma pasada del modelo
+        vectors, sparse_vectors = encode_chunks_hybrid(hybrid_encoder, texts, batch_size, vector_cache)
+    else:
+        vectors = encode_chunks(embed_model, texts, batch_size, vector_cache)
+    counts = {}
+    for i, ((doc, idx), vec) in enumerate(zip(work, vectors)):
         payload = {
-            "text": chunk,
-            "source": rel_path,
-            "doc_id": doc_id,
+            "text": doc["chunks"][idx],
+            "source": doc["rel_path"],
+            "doc_id": doc["doc_id"],
             "chunk_id": idx,
-            "mtime": mtime,
-            "ext": ext,
-            "title": path.stem,
+            "mtime": int(doc["mtime"]),
+            "ext": doc["ext"],
+            "title": doc["title"],
         }
-        points.append(models.PointStruct(id=pid, vector=vec, payload=payload))
+        vector = vec.tolist()
+        if sparse_vectors:
+            vector = {"": vector, sparse.SPARSE_VECTOR_NAME: sparse_vectors[i]}
+        upserter.add(models.PointStruct(id=point_id(doc["doc_id"], idx), vector=vector, payload=payload))
+        counts[doc["rel_path"]] = counts.get(doc["rel_path"], 0) + 1
 
-    qdrant.upsert(collection_name=COLLECTION, points=points)
-    print(f"[ok] {path.name}: {len(points)} chunks")
-    return len(points)
+    return [(doc, counts.get(doc["rel_path"], 0)) for doc in docs]
+
+
+def delete_points(ids):
+    if ids:
+        qdrant.delete(collection_name=COLLECTION, points_selector=models.PointIdsList(points=ids))
+
+# ---- Manifiesto (ingesta incremental) ----
+# { ruta relativa: {mtime, size, hash, doc_id, chunks: [hash del texto de cada chunk]} }
+def load_manifest(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[warn] Manifiesto ilegible ({e}), se reindexa todo")
+        return {}
+
+def save_manifest(path: Path, manifest: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+def is_unchanged(path: Path, entry) -> bool:
+    """Mismo mtime y tamaño, o mismo contenido aunque el mtime haya cambiado."""
+    if not entry:
+        return False
+    stat = path.stat()
+    if stat.st_mtime == entry["mtime"] and stat.st_size == entry["size"]:
+        return True
+    if stat.st_size == entry["size"] and file_sha1(path) == entry["hash"]:
+        entry["mtime"] = stat.st_mtime
+        return True
+    return False
 
 def delete_by_doc_id(doc_id: str):
     # Elimina todos los puntos cuyo payload.doc_id == doc_id
@@ -152,12 +251,32 @@ def delete_by_doc_id(doc_id: str):
     )
 
 def main():
+    global models, sparse, qdrant, embed_model, vector_cache, hybrid_encoder
     parser = argparse.ArgumentParser()
     parser.add_argument("--path", default="/data", help="Carpeta con documentos a indexar")
     parser.add_argument("--clean-doc", default=None, help="doc_id para eliminar antes de reingestar")
     parser.add_argument("--recreate", action="store_true", help="Recrear colección (borra todo)")
+    parser.add_argument("--incremental", action="store_true", help="Solo reindexar lo que cambió desde la última ejecución")
+    parser.add_argument("--manifest", default=None, help=f"Ruta del manifiesto (por defecto <path>/{MANIFEST_NAME})")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks por llamada al modelo de embeddings")
+    parser.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH_SIZE, help="Puntos por petición de upsert a Qdrant")
+    parser.add_argument("--upsert-parallel", type=int, default=UPSERT_PARALLEL, help="Peticiones de upsert simultáneas")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Procesos de parseo (1 = sin pool)")
+    parser.add_argument("--hybrid", action="store_true", default=HYBRID_SEARCH, help="Guardar también los pesos léxicos para la búsqueda híbrida")
+    parser.add_argument("--embed-cache", default=EMBED_DISK_CACHE, help="Caché persistente de embeddings (\"\" = sin caché)")
     args = parser.parse_args()
 
+    from qdrant_client import QdrantClient, models
+    from sentence_transformers import SentenceTransformer
+    import sparse
+
+    qdrant = QdrantClient(url=QDRANT_URL)
+    # Con --hybrid, una sola copia de BGE-M3 (FlagEmbedding) da densos y dispersos
+    if args.hybrid:
+        hybrid_encoder = sparse.open_hybrid_encoder(EMBED_MODEL_NAME)
+    embed_model = hybrid_encoder or SentenceTransformer(EMBED_MODEL_NAME)
+    vector_cache = open_cache(args.embed_cache, EMBED_MODEL_NAME, EMBED_DISK_CACHE_DTYPE, EMBED_DISK_CACHE_MAX)
+
     ensure_collection()
     if args.recreate:
         qdrant.delete_collection(COLLECTION)
@@ -165,19 +284,97 @@ def main():
         ensure_collection()
         print("[info] Colección recreada")
 
+    if hybrid_encoder and not sparse.collection_has_sparse(qdrant, COLLECTION):
+        print("[warn] La colección no tiene vector disperso: usa --recreate para la búsqueda híbrida")
+        hybrid_encoder = None  # embed_model sigue sirviendo para los densos
+
     base = Path(args.path)
     if not base.exists():
         print(f"[error] No existe {base}")
         return
 
+    # El manifiesto se escribe siempre: permite borrar chunks huérfanos en cualquier modo
+    # y que la siguiente ejecución pueda ser incremental
+    manifest_path = Path(args.manifest) if args.manifest else base / MANIFEST_NAME
+    previous = load_manifest(manifest_path) if not args.recreate else {}
+    manifest = {}
+
     if args.clean_doc:
         delete_by_doc_id(args.clean_doc)
+        previous = {k: v for k, v in previous.items() if v["doc_id"] != args.clean_doc}
         print(f"[info] Eliminado doc_id={args.clean_doc}")
 
-    total = 0
+    # Los archivos sin cambios se descartan antes de mandarlos a parsear
+    to_parse, entries = [], {}
+    skipped = 0
     for p in discover_files(base):
-        total += upsert_document(p, base)
-    print(f"[done] Total chunks: {total}")
+        rel_path = str(p.relative_to(base))
+        entry = previous.pop(rel_path, None)
+        if args.incremental and is_unchanged(p, entry):
+            manifest[rel_path] = entry
+            skipped += 1
+            continue
+        entries[rel_path] = entry
+        to_parse.append(p)
+
+    # Los chunks de varios documentos se juntan hasta tener unos cuantos lotes del modelo,
+    # así los documentos cortos no desperdician llamadas y el orden por longitud ayuda más
+    flush_at = max(1, args.batch_size) * 4
+    upserter = Upserter(args.upsert_batch, args.upsert_parallel)
+    progress = Progress()
+    total = 0
+    pending, pending_chunks = [], 0
+
+    def flush():
+        nonlocal total, pending, pending_chunks
+        for doc, count in embed_documents(pending, upserter, args.batch_size, reembed=not args.incremental):
+            old = doc["previous"]
+            # El documento se acortó: sus últimos chunks ya no existen
+            orphans = [point_id(doc["doc_id"], idx) for idx in range(len(doc["chunks"]), len(old["chunks"]))] if old else []
+            upserter.delete(orphans)
+            if old and args.incremental:
+                print(f"[ok] {doc['name']}: {count}/{len(doc['chunks'])} chunks actualizados, {len(orphans)} eliminados")
+            else:
+                print(f"[ok] {doc['name']}: {count} chunks")
+            manifest[doc["rel_path"]] = {
+                "mtime": doc["mtime"],
+                "size": doc["size"],
+                "hash": doc["hash"],
+                "doc_id": doc["doc_id"],
+                "chunks": doc["chunk_hashes"],
+            }
+            total += count
+            progress.add(docs=1, chunks=count)
+        pending, pending_chunks = [], 0
+
+    try:
+        for doc in parse_all(to_parse, base, args.workers):
+            entry = entries[doc["rel_path"]]
+            if "error" in doc:
+                print(doc["error"])
+                if entry:
+                    # Ya no se puede leer o quedó vacío: fuera sus chunks antiguos
+                    upserter.delete([point_id(entry["doc_id"], idx) for idx in range(len(entry["chunks"]))])
+                progress.add(docs=1)
+                continue
+            doc["previous"] = entry
+            pending.append(doc)
+            pending_chunks += len(doc["chunks"])
+            if pending_chunks >= flush_at:
+                flush()
+        if pending:
+            flush()
+
+        # Lo que queda en el manifiesto anterior son documentos borrados
+        for rel_path, entry in previous.items():
+            upserter.delete([point_id(entry["doc_id"], idx) for idx in range(len(entry["chunks"]))])
+            print(f"[del] {rel_path}: {len(entry['chunks'])} chunks")
+    finally:
+        upserter.close()
+
+    save_manifest(manifest_path, manifest)
+    print(f"[done] Total chunks: {total} (sin cambios: {skipped} archivos, eliminados: {len(previous)})")
+    print(f"[done] {progress.report()}")
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,21 @@
 from fastapi import FastAPI, Query, HTTPException
+from contextlib import asynccontextmanager
+from fastapi.responses import StreamingResponse
 import os
+import json
 import asyncio
-from functools import lru_cache
-from typing import List, Optional, Protocol
+from typing import AsyncIterator, List, Optional, Protocol
 import httpx
-from qdrant_client import QdrantClient
+import numpy as np
+from qdrant_client import QdrantClient, models
 from sentence_transformers import SentenceTransformer
 from pydantic import BaseModel # Import BaseModel
+from embedding import EmbeddingBatcher
+from answer_cache import SemanticAnswerCache
+from vector_cache import open_cache
+from sparse import SPARSE_VECTOR_NAME, collection_has_sparse, open_hybrid_encoder, rrf_fuse, sparse_vectors_config
+from indexing import encode_chunks, encode_chunks_hybrid, upsert_points
+from rerank import Reranker, pack_context
 
 # --- Configuración ---
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama").lower()
@@ -16,24 +25,85 @@ QDRANT_HOST = os.getenv("QDRANT_HOST", "http://localhost:6333")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "30"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
 MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "4"))
+# Segundos que una conexión ociosa se mantiene abierta para reutilizarla
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
 
 # RAG Params Defaults (from env vars)
 DEFAULT_K = int(os.getenv("RAG_K", "3"))
 DEFAULT_MAX_CONTEXT = int(os.getenv("RAG_MAX_CONTEXT", "4000"))
 DEFAULT_TEMPERATURE = float(os.getenv("RAG_TEMPERATURE", "0.0"))
 DEFAULT_MAX_LENGTH = int(os.getenv("RAG_MAX_LENGTH", "1024"))
+# Búsqueda híbrida (densa + léxica de BGE-M3, fusionadas con RRF)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "false").lower() in ("1", "true", "yes")
+DEFAULT_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Candidatos que se piden a cada búsqueda, como múltiplo de k
+HYBRID_PREFETCH = int(os.getenv("RAG_HYBRID_PREFETCH", "4"))
+# Reranking con cross-encoder: se piden k * RERANK_FETCH candidatos y solo los mejores
+# entran en un contexto de como mucho RAG_CONTEXT_TOKENS tokens
+RERANK = os.getenv("RERANK", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "BAAI/bge-reranker-v2-m3")
+RERANK_FETCH = int(os.getenv("RERANK_FETCH", "4"))
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.1"))
+RERANK_RELATIVE_CUTOFF = float(os.getenv("RERANK_RELATIVE_CUTOFF", "0.3"))
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1000"))
 
 # Other RAG related constants
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "docs")
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-m3")
 EMBEDDING_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "256"))
+# Caché persistente de embeddings compartida con ingest.py (vacío = desactivada)
+EMBED_DISK_CACHE = os.getenv("EMBED_DISK_CACHE", "/cache/embeddings.sqlite")
+EMBED_DISK_CACHE_DTYPE = os.getenv("EMBED_DISK_CACHE_DTYPE", "float16")
+EMBED_DISK_CACHE_MAX = int(os.getenv("EMBED_DISK_CACHE_MAX", "100000"))
+# Micro-lotes de consultas: se agrupan las que llegan dentro de la ventana
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+# Ingesta: chunks por llamada al modelo y puntos por petición a Qdrant
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "32"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+UPSERT_PARALLEL = int(os.getenv("UPSERT_PARALLEL", "4"))
+# Caché semántica de respuestas (0 entradas = desactivada)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
 
 
 # Clientes y modelos globales
 qdrant = QdrantClient(url=QDRANT_HOST)
-embed_model = SentenceTransformer("BAAI/bge-m3")
-app = FastAPI(title="Multi-LLM RAG API")
+# Con HYBRID_SEARCH, BGE-M3 se carga con FlagEmbedding y la misma copia da el vector
+# denso y los pesos léxicos en una sola pasada
+hybrid_encoder = open_hybrid_encoder(EMBEDDING_MODEL_NAME) if HYBRID_SEARCH else None
+embed_model = hybrid_encoder or SentenceTransformer(EMBEDDING_MODEL_NAME)
+vector_cache = open_cache(EMBED_DISK_CACHE, EMBEDDING_MODEL_NAME, EMBED_DISK_CACHE_DTYPE, EMBED_DISK_CACHE_MAX)
+reranker = Reranker(RERANK_MODEL) if RERANK else None
+if reranker is not None:
+    reranker.check_calibration(RERANK_MIN_SCORE)
+
+def _encode_queries(texts):
+    if hybrid_encoder is not None:
+        # (densos, dispersos) de una pasada. La caché en disco solo tiene densos: con
+        # ella habría que volver a pasar por el modelo para los dispersos igualmente.
+        return hybrid_encoder.encode_hybrid(texts, batch_size=EMBED_BATCH_MAX)
+    if vector_cache is None:
+        return embed_model.encode(texts, batch_size=EMBED_BATCH_MAX)
+    return vector_cache.encode(texts, lambda missing: embed_model.encode(missing, batch_size=EMBED_BATCH_MAX))
+
+# Todas las consultas se codifican en un hilo dedicado, nunca en el event loop
+embedder = EmbeddingBatcher(
+    _encode_queries,
+    max_batch=EMBED_BATCH_MAX,
+    window=EMBED_BATCH_WINDOW_MS / 1000,
+    cache_size=EMBEDDING_CACHE_SIZE
+)
+# Preguntas casi iguales reutilizan la respuesta sin buscar ni llamar al LLM
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_SIZE
+)
 semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
 
 # --- Abstracción de Proveedores ---
@@ -42,63 +112,175 @@ class LLMProvider(Protocol):
     async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
         ...
 
-class OllamaProvider:
-    async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
-        payload = {
+    def stream(self, prompt: str, temperature: float, max_length: int) -> AsyncIterator[str]:
+        """Emite los fragmentos de texto a medida que el modelo los genera."""
+        ...
+
+async def _sse_data(response: httpx.Response) -> AsyncIterator[dict]:
+    """Itera los eventos `data: {...}` de una respuesta Server-Sent Events."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield json.loads(data)
+
+class PooledProvider:
+    """
+    Cliente HTTP compartido por todas las peticiones de un proveedor: mantiene las
+    conexiones abiertas (keep-alive, HTTP/2 cuando el servidor lo soporta) en lugar de
+    abrir una nueva, con TLS, en cada pregunta. Lo abre y cierra el lifespan de la app.
+    """
+    timeout: float = 30
+    http2: bool = False
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self.open()
+        return self._client
+
+    def open(self):
+        # El semáforo ya limita las peticiones simultáneas, el pool no necesita más
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY,
+                max_keepalive_connections=MAX_CONCURRENCY,
+                keepalive_expiry=HTTP_KEEPALIVE
+            )
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class OllamaProvider(PooledProvider):
+    timeout = OLLAMA_TIMEOUT
+
+    def _payload(self, prompt: str, temperature: float, max_length: int, stream: bool) -> dict:
+        return {
             "model": OLLAMA_MODEL,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "temperature": temperature,
             "max_length": max_length
         }
+
+    async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
+        payload = self._payload(prompt, temperature, max_length, stream=False)
         async with semaphore:
-            async with httpx.AsyncClient(timeout=OLLAMA_TIMEOUT) as client:
-                r = await client.post(f"{OLLAMA_HOST}/api/generate", json=payload)
+            r = await self.client.post(f"{OLLAMA_HOST}/api/generate", json=payload)
+            if r.status_code != 200:
+                raise HTTPException(status_code=500, detail=f"Ollama error: {r.text}")
+            return r.json().get("response", "")
+
+    async def stream(self, prompt: str, temperature: float, max_length: int) -> AsyncIterator[str]:
+        payload = self._payload(prompt, temperature, max_length, stream=True)
+        async with semaphore:
+            async with self.client.stream("POST", f"{OLLAMA_HOST}/api/generate", json=payload) as r:
                 if r.status_code != 200:
-                    raise HTTPException(status_code=500, detail=f"Ollama error: {r.text}")
-                return r.json().get("response", "")
+                    raise HTTPException(status_code=500, detail=f"Ollama error: {(await r.aread()).decode()}")
+                # Ollama envía un objeto JSON por línea
+                async for line in r.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        return
 
-class OpenAIProvider:
-    async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
+class OpenAIProvider(PooledProvider):
+    timeout = OPENAI_TIMEOUT
+    http2 = True
+
+    def _payload(self, prompt: str, temperature: float, max_length: int, stream: bool) -> dict:
         if not OPENAI_API_KEY:
             raise HTTPException(status_code=500, detail="OpenAI API Key not configured")
-        
-        payload = {
+
+        return {
             "model": "gpt-4o-mini", # O el configurado
             "messages": [{"role": "user", "content": prompt}],
             "temperature": temperature,
-            "max_tokens": max_length
+            "max_tokens": max_length,
+            "stream": stream
         }
+
+    async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
+        payload = self._payload(prompt, temperature, max_length, stream=False)
         async with semaphore:
-            async with httpx.AsyncClient(timeout=30) as client:
-                r = await client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    json=payload,
-                    headers={"Authorization": f"Bearer {OPENAI_API_KEY}"}
-                )
+            r = await self.client.post(
+                "https://api.openai.com/v1/chat/completions",
+                json=payload,
+                headers={"Authorization": f"Bearer {OPENAI_API_KEY}"}
+            )
+            if r.status_code != 200:
+                raise HTTPException(status_code=500, detail=f"OpenAI error: {r.text}")
+            return r.json()["choices"][0]["message"]["content"]
+
+    async def stream(self, prompt: str, temperature: float, max_length: int) -> AsyncIterator[str]:
+        payload = self._payload(prompt, temperature, max_length, stream=True)
+        async with semaphore:
+            async with self.client.stream(
+                "POST",
+                "https://api.openai.com/v1/chat/completions",
+                json=payload,
+                headers={"Authorization": f"Bearer {OPENAI_API_KEY}"}
+            ) as r:
                 if r.status_code != 200:
-                    raise HTTPException(status_code=500, detail=f"OpenAI error: {r.text}")
-                return r.json()["choices"][0]["message"]["content"]
+                    raise HTTPException(status_code=500, detail=f"OpenAI error: {(await r.aread()).decode()}")
+                async for data in _sse_data(r):
+                    choices = data.get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        yield text
 
-class GeminiProvider:
-    async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
+class GeminiProvider(PooledProvider):
+    timeout = GEMINI_TIMEOUT
+    http2 = True
+    BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash"
+
+    def _payload(self, prompt: str, temperature: float, max_length: int) -> dict:
         if not GEMINI_API_KEY:
             raise HTTPException(status_code=500, detail="Gemini API Key not configured")
-        
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-        payload = {
+
+        return {
             "contents": [{"parts": [{"text": prompt}]}],
             "generationConfig": {
                 "temperature": temperature,
                 "maxOutputTokens": max_length
             }
         }
+
+    async def generate(self, prompt: str, temperature: float, max_length: int) -> str:
+        payload = self._payload(prompt, temperature, max_length)
+        url = f"{self.BASE_URL}:generateContent?key={GEMINI_API_KEY}"
         async with semaphore:
-            async with httpx.AsyncClient(timeout=30) as client:
-                r = await client.post(url, json=payload)
+            r = await self.client.post(url, json=payload)
+            if r.status_code != 200:
+                raise HTTPException(status_code=500, detail=f"Gemini error: {r.text}")
+            return r.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    async def stream(self, prompt: str, temperature: float, max_length: int) -> AsyncIterator[str]:
+        payload = self._payload(prompt, temperature, max_length)
+        url = f"{self.BASE_URL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+        async with semaphore:
+            async with self.client.stream("POST", url, json=payload) as r:
                 if r.status_code != 200:
-                    raise HTTPException(status_code=500, detail=f"Gemini error: {r.text}")
-                return r.json()["candidates"][0]["content"]["parts"][0]["text"]
+                    raise HTTPException(status_code=500, detail=f"Gemini error: {(await r.aread()).decode()}")
+                async for data in _sse_data(r):
+                    for candidate in data.get("candidates", []):
+                        for part in candidate.get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
 
 # Selección de proveedor
 def get_llm_provider() -> LLMProvider:
@@ -110,6 +292,17 @@ def get_llm_provider() -> LLMProvider:
 
 llm = get_llm_provider()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    llm.open()
+    yield
+    await llm.aclose()
+    await embedder.aclose()
+    if vector_cache is not None:
+        vector_cache.close()
+
+app = FastAPI(title="Multi-LLM RAG API", lifespan=lifespan)
+
 # Debug: Inspect Qdrant Client
 import sys
 print(f"DEBUG: Qdrant client attributes: {dir(qdrant)}", file=sys.stderr)
@@ -121,11 +314,6 @@ except:
 
 # --- Helpers ---
 
-@lru_cache(maxsize=EMBEDDING_CACHE_SIZE)
-def _cached_encode(query: str) -> tuple:
-    vec = embed_model.encode(query)
-    return tuple(float(x) for x in vec)
-
 def _extract_text_from_hit(hit) -> Optional[str]:
     payload = getattr(hit, "payload", {}) if hasattr(hit, "payload") else hit.get("payload", {})
     for key in ("text", "content", "body", "document"):
@@ -137,32 +325,98 @@ def _truncate(s: str, max_chars: int) -> str:
     if not s: return ""
     return s if len(s) <= max_chars else s[:max_chars].rsplit(" ", 1)[0] + "..."
 
+def _rerank_hits(query: str, hits: list, k: int, context_tokens: int):
+    """Puntúa los candidatos con el cross-encoder y devuelve [(hit, texto)] para el contexto."""
+    candidates = [(hit, _extract_text_from_hit(hit)) for hit in hits]
+    candidates = [(hit, text) for hit, text in candidates if text]
+    scores = reranker.score(query, [text for _, text in candidates])
+    selected = pack_context(
+        [text for _, text in candidates],
+        scores,
+        max_passages=k,
+        budget_tokens=context_tokens,
+        count_tokens=reranker.count_tokens,
+        truncate_tokens=reranker.truncate_tokens,
+        min_score=RERANK_MIN_SCORE,
+        relative_cutoff=RERANK_RELATIVE_CUTOFF
+    )
+    print(f"INFO: Rerank kept {len(selected)}/{len(candidates)} passages "
+          f"(scores: {', '.join(f'{scores[i]:.2f}' for i, _ in selected)})")
+    return [(candidates[i][0], text) for i, text in selected]
+
+def _use_hybrid(requested: Optional[bool]) -> bool:
+    """Sin el modelo léxico cargado la búsqueda es siempre densa."""
+    hybrid = HYBRID_SEARCH if requested is None else requested
+    return hybrid and hybrid_encoder is not None
+
+def _use_rerank(requested: Optional[bool]) -> bool:
+    """Sin el cross-encoder cargado (RERANK=false) no se reordena."""
+    rerank = RERANK if requested is None else requested
+    return rerank and reranker is not None
+
 # --- Endpoints ---
 
-@app.get("/ask")
-async def ask(
-    query: str = Query(...),
-    k: int = DEFAULT_K,
-    max_context_chars: int = DEFAULT_MAX_CONTEXT,
-    temperature: float = DEFAULT_TEMPERATURE,
-    max_length: int = DEFAULT_MAX_LENGTH,
-    include_sources: bool = False
-):
-    print(f"INFO: Querying: {query} (k={k}, sources={include_sources})")
-    # 1) Embedding
+async def _embed(query: str) -> List[float]:
     try:
-        vec = list(_cached_encode(query))
+        return await embedder.encode(query)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Embedding error: {e}")
 
-    # 2) Buscar en Qdrant
-    try:
-        hits = await asyncio.to_thread(lambda: qdrant.search(
+async def _hybrid_search(query: str, vec: List[float], k: int, rrf_k: int):
+    """Búsquedas densa y dispersa en paralelo, fusionadas con RRF."""
+    # Sale de la misma pasada que `vec` (caché del batcher), sin volver al modelo
+    _, sparse_vec = await embedder.encode_hybrid(query)
+    limit = k * max(1, HYBRID_PREFETCH)
+    dense_hits, sparse_hits = await asyncio.gather(
+        asyncio.to_thread(lambda: qdrant.search(
             collection_name="docs",
             query_vector=vec,
-            limit=k,
+            limit=limit,
             with_payload=True
-        ))
+        )),
+        asyncio.to_thread(lambda: qdrant.search(
+            collection_name="docs",
+            query_vector=models.NamedSparseVector(name=SPARSE_VECTOR_NAME, vector=sparse_vec),
+            limit=limit,
+            with_payload=True
+        )),
+        return_exceptions=True
+    )
+    if isinstance(dense_hits, Exception):
+        raise dense_hits
+    if isinstance(sparse_hits, Exception):
+        # Colección indexada antes de activar la búsqueda híbrida
+        print(f"WARN: Sparse search failed, using dense results only: {sparse_hits}", file=sys.stderr)
+        return dense_hits[:k]
+    return rrf_fuse([dense_hits, sparse_hits], limit=k, k=rrf_k)
+
+async def _retrieve(
+    query: str,
+    k: int,
+    max_context_chars: int,
+    vec: Optional[List[float]] = None,
+    hybrid: bool = False,
+    rrf_k: int = DEFAULT_RRF_K,
+    rerank: bool = False,
+    context_tokens: int = DEFAULT_CONTEXT_TOKENS
+):
+    """Embedding + búsqueda en Qdrant (+ reranking). Devuelve (prompt, fuentes)."""
+    # 1) Embedding
+    if vec is None:
+        vec = await _embed(query)
+
+    # 2) Buscar en Qdrant (con reranking se piden más candidatos de los que se usarán)
+    limit = k * max(1, RERANK_FETCH) if rerank else k
+    try:
+        if hybrid:
+            hits = await _hybrid_search(query, vec, limit, rrf_k)
+        else:
+            hits = await asyncio.to_thread(lambda: qdrant.search(
+                collection_name="docs",
+                query_vector=vec,
+                limit=limit,
+                with_payload=True
+            ))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -171,9 +425,18 @@ async def ask(
 
     # 3) Construir Contexto
     docs = []
-    for hit in hits:
-        text = _extract_text_from_hit(hit)
-        if text: docs.append(_truncate(text, 1500))
+    if rerank:
+        # Solo los pasajes más relevantes, dentro del presupuesto de tokens
+        try:
+            selected = await embedder.run(_rerank_hits, query, hits, k, context_tokens)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Rerank error: {e}")
+        hits = [hit for hit, _ in selected]
+        docs = [text for _, text in selected]
+    else:
+        for hit in hits:
+            text = _extract_text_from_hit(hit)
+            if text: docs.append(_truncate(text, 1500))
 
     if docs:
         combined = "\n\n---\n\n".join(docs)
@@ -186,20 +449,137 @@ async def ask(
     else:
         prompt = f"Responde de forma breve y clara: {query}"
 
-    # 4) Generar Respuesta con el proveedor seleccionado
-    answer = await llm.generate(prompt, temperature=temperature, max_length=max_length)
-
-    # 5) Fuentes
+    # 4) Fuentes
     sources = []
     for hit in hits:
         payload = getattr(hit, "payload", {}) if hasattr(hit, "payload") else hit.get("payload", {})
         sources.append({"id": getattr(hit, "id", None), "source": payload.get("source")})
 
-    response = {"answer": answer}
+    return prompt, sources
+
+@app.get("/ask")
+async def ask(
+    query: str = Query(...),
+    k: int = DEFAULT_K,
+    max_context_chars: int = DEFAULT_MAX_CONTEXT,
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    include_sources: bool = False,
+    hybrid: Optional[bool] = Query(None, description="Búsqueda densa + léxica (por defecto HYBRID_SEARCH)"),
+    rrf_k: int = DEFAULT_RRF_K,
+    rerank: Optional[bool] = Query(None, description="Reordenar con el cross-encoder (por defecto RERANK)"),
+    context_tokens: int = DEFAULT_CONTEXT_TOKENS
+):
+    hybrid = _use_hybrid(hybrid)
+    rerank = _use_rerank(rerank)
+    print(f"INFO: Querying: {query} (k={k}, hybrid={hybrid}, rerank={rerank}, sources={include_sources})")
+    vec = await _embed(query)
+    params = (k, max_context_chars, temperature, max_length, hybrid, rrf_k, rerank, context_tokens)
+    cached = answer_cache.get(vec, params)
+    if cached:
+        print(f"INFO: Answer cache hit ({cached['similarity']:.3f}): {cached['query']}")
+        answer, sources = cached["answer"], cached["sources"]
+    else:
+        prompt, sources = await _retrieve(query, k, max_context_chars, vec, hybrid, rrf_k, rerank, context_tokens)
+        version = answer_cache.version
+
+        # Generar Respuesta con el proveedor seleccionado
+        answer = await llm.generate(prompt, temperature=temperature, max_length=max_length)
+        # Solo si la colección no cambió mientras se generaba
+        if answer_cache.version == version:
+            answer_cache.put(vec, params, query, answer, sources)
+
+    response = {"answer": answer, "cached": cached is not None}
     if include_sources:
         response["sources"] = sources
     return response
 
+@app.get("/ask/stream")
+async def ask_stream(
+    query: str = Query(...),
+    k: int = DEFAULT_K,
+    max_context_chars: int = DEFAULT_MAX_CONTEXT,
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    hybrid: Optional[bool] = Query(None, description="Búsqueda densa + léxica (por defecto HYBRID_SEARCH)"),
+    rrf_k: int = DEFAULT_RRF_K,
+    rerank: Optional[bool] = Query(None, description="Reordenar con el cross-encoder (por defecto RERANK)"),
+    context_tokens: int = DEFAULT_CONTEXT_TOKENS
+):
+    """
+    Igual que /ask pero la respuesta se emite mientras el LLM la genera, como NDJSON
+    (un objeto JSON por línea):
+        {"type": "token", "text": "..."}                       por cada fragmento
+        {"type": "done", "answer": "...", "sources": [...]}    al terminar
+        {"type": "error", "detail": "..."}                     si el LLM falla a mitad
+    Si la respuesta sale de la caché semántica llega entera en un único token.
+    """
+    hybrid = _use_hybrid(hybrid)
+    rerank = _use_rerank(rerank)
+    print(f"INFO: Streaming query: {query} (k={k}, hybrid={hybrid}, rerank={rerank})")
+    # Los errores de embedding/Qdrant siguen devolviendo un código HTTP normal
+    vec = await _embed(query)
+    params = (k, max_context_chars, temperature, max_length, hybrid, rrf_k, rerank, context_tokens)
+    cached = answer_cache.get(vec, params)
+    if cached:
+        print(f"INFO: Answer cache hit ({cached['similarity']:.3f}): {cached['query']}")
+
+        async def cached_events():
+            yield json.dumps({"type": "token", "text": cached["answer"]}, ensure_ascii=False) + "\n"
+            yield json.dumps(
+                {"type": "done", "answer": cached["answer"], "sources": cached["sources"], "cached": True},
+                ensure_ascii=False
+            ) + "\n"
+
+        return StreamingResponse(cached_events(), media_type="application/x-ndjson")
+
+    prompt, sources = await _retrieve(query, k, max_context_chars, vec, hybrid, rrf_k, rerank, context_tokens)
+    version = answer_cache.version
+
+    async def events():
+        parts = []
+        try:
+            async for text in llm.stream(prompt, temperature=temperature, max_length=max_length):
+                parts.append(text)
+                yield json.dumps({"type": "token", "text": text}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # Las cabeceras ya se enviaron: el error viaja como un evento más
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"ERROR: Streaming generation failed: {detail}", file=sys.stderr)
+            yield json.dumps({"type": "error", "detail": detail}, ensure_ascii=False) + "\n"
+            return
+        answer = "".join(parts)
+        # Solo si la colección no cambió mientras se generaba
+        if answer_cache.version == version:
+            answer_cache.put(vec, params, query, answer, sources)
+        yield json.dumps(
+            {"type": "done", "answer": answer, "sources": sources, "cached": False},
+            ensure_ascii=False
+        ) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def _encode_for_ingest(chunks: List[str], hybrid: bool):
+    """
+    (densos, dispersos o None) de los chunks de /ingest, en el hilo del modelo y por
+    tramos de INGEST_BATCH_SIZE. El modelo y su tokenizer no admiten llamadas desde
+    varios hilos, y las consultas que lleguen mientras tanto se codifican entre un
+    tramo y el siguiente en lugar de esperar a todo el documento.
+    """
+    parts = []
+    sparse_vectors = [] if hybrid else None
+    for start in range(0, len(chunks), INGEST_BATCH_SIZE):
+        part = chunks[start:start + INGEST_BATCH_SIZE]
+        if hybrid:
+            dense, lexical = await embedder.run(
+                encode_chunks_hybrid, hybrid_encoder, part, INGEST_BATCH_SIZE, vector_cache
+            )
+            sparse_vectors.extend(lexical)
+        else:
+            dense = await embedder.run(encode_chunks, embed_model, part, INGEST_BATCH_SIZE, vector_cache)
+        parts.append(dense)
+    return np.concatenate(parts), sparse_vectors
+
 @app.post("/ingest")
 async def ingest(
     text: str = Query(..., description="Texto a ingerir"),
@@ -210,28 +590,42 @@ async def ingest(
         # 1. Chunking simple
         chunk_size = 500
         chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+        if not chunks:
+            # Sin chunks no hay dimensión con la que crear la colección
+            return {"status": "success", "chunks_processed": 0}
         
         points = []
         import uuid
         
-        # 2. Embeddings y Preparación
-        for chunk in chunks:
-            vec = list(_cached_encode(chunk))
+        # 2. Embeddings por lotes, sin pasar por la caché de consultas.
+        # Pesos léxicos solo si la colección tiene (o tendrá) el vector disperso; salen
+        # de la misma pasada del modelo que los densos.
+        exists = qdrant.collection_exists("docs")
+        hybrid = hybrid_encoder is not None and (not exists or collection_has_sparse(qdrant, "docs"))
+        vectors, sparse_vectors = await _encode_for_ingest(chunks, hybrid)
+
+        # Asegurar que colección existe (idempotente)
+        if not exists:
+            qdrant.create_collection(
+                collection_name="docs",
+                vectors_config={"size": vectors.shape[1], "distance": "Cosine"},
+                sparse_vectors_config=sparse_vectors_config() if hybrid_encoder else None
+            )
+
+        for i, (chunk, vec) in enumerate(zip(chunks, vectors)):
+            vector = vec.tolist()
+            if sparse_vectors:
+                vector = {"": vector, SPARSE_VECTOR_NAME: sparse_vectors[i]}
             points.append({
                 "id": str(uuid.uuid4()),
-                "vector": vec,
+                "vector": vector,
                 "payload": {"text": chunk, "source": source}
             })
             
         # 3. Upsert a Qdrant
-        # Asegurar que colección existe (idempotente)
-        if not qdrant.collection_exists("docs"):
-            qdrant.create_collection(
-                collection_name="docs",
-                vectors_config={"size": len(points[0]["vector"]), "distance": "Cosine"}
-            )
-            
-        qdrant.upsert(collection_name="docs", points=points)
+
+        await asyncio.to_thread(upsert_points, qdrant, "docs", points, UPSERT_BATCH_SIZE, UPSERT_PARALLEL)
+        answer_cache.invalidate()
         
         return {"status": "success", "chunks_processed": len(chunks)}
         
@@ -241,18 +635,33 @@ async def ingest(
 @app.delete("/purge")
 async def purge_db():
     try:
-        from qdrant_client.http import models
         qdrant.recreate_collection(
             collection_name=COLLECTION_NAME,
             vectors_config=models.VectorParams(
                 size=1024,  # BAAI/bge-m3 dim
                 distance=models.Distance.COSINE
-            )
+            ),
+            sparse_vectors_config=sparse_vectors_config() if hybrid_encoder else None
         )
+        answer_cache.invalidate()
         return {"status": "success", "message": "Knowledge Base purged."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
 async def health():
-    return {"provider": LLM_PROVIDER, "status": "ok"}
+    return {
+        "provider": LLM_PROVIDER,
+        "status": "ok",
+        "embedding": embedder.stats(),
+        "vector_cache": vector_cache.stats() if vector_cache is not None else None,
+        "answer_cache": answer_cache.stats(),
+        "hybrid": hybrid_encoder is not None,
+        "rerank": reranker is not None
+    }
+
+@app.delete("/cache")
+async def clear_cache():
+    """Vacía la caché de respuestas (p. ej. tras reindexar con ingest.py)."""
+    answer_cache.invalidate()
+    return {"status": "success", "version": answer_cache.version}
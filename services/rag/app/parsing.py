@@ -0,0 +1,118 @@
+import re, hashlib
+from pathlib import Path
+
+# Lectura, normalización y chunking de documentos. Sin dependencias pesadas (ni modelo
+# ni Qdrant) para que los procesos de parseo de ingest.py arranquen rápido.
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+
+# ---- Utilidades ----
+def sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8", errors="ignore")).hexdigest()
+
+def file_sha1(p: Path) -> str:
+    h = hashlib.sha1()
+    with open(p, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def point_id(doc_id: str, idx: int) -> int:
+    return int(sha1(f"{doc_id}-{idx}")[:16], 16)  # entero estable a partir de hash
+
+def norm_ws(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+def chunk_text(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    words = text.split()
+    if not words:
+        return []
+    chunks = []
+    i = 0
+    while i < len(words):
+        chunk = " ".join(words[i:i+size])
+        chunks.append(chunk)
+        i += size - overlap
+        if i < 0: break
+    return chunks
+
+# ---- Loaders por tipo ----
+def read_txt(p: Path) -> str:
+    import chardet
+    data = p.read_bytes()
+    enc = chardet.detect(data).get("encoding") or "utf-8"
+    return data.decode(enc, errors="ignore")
+
+def read_md(p: Path) -> str:
+    return read_txt(p)
+
+def read_pdf(p: Path) -> str:
+    from pypdf import PdfReader
+    reader = PdfReader(str(p))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+def read_docx(p: Path) -> str:
+    import docx
+    doc = docx.Document(str(p))
+    return "\n".join(par.text for par in doc.paragraphs)
+
+def read_html(p: Path) -> str:
+    from bs4 import BeautifulSoup
+    html = read_txt(p)
+    soup = BeautifulSoup(html, "html.parser")
+    # Opcional: quita scripts/estilos
+    for tag in soup(["script","style","noscript"]):
+        tag.decompose()
+    return soup.get_text(separator=" ")
+
+READERS = {
+    ".txt": read_txt,
+    ".md": read_md,
+    ".pdf": read_pdf,
+    ".docx": read_docx,
+    ".html": read_html,
+    ".htm": read_html,
+}
+
+
+# ---- Parseo completo de un documento (se ejecuta en los procesos del pool) ----
+def parse_document(path: str, base_dir: str) -> dict:
+    """
+    Lee, normaliza y trocea un documento. Devuelve un dict con los chunks y los datos
+    del manifiesto, o con `error` si no se pudo indexar.
+    """
+    p = Path(path)
+    rel_path = str(p.relative_to(base_dir))
+    ext = p.suffix.lower()
+    result = {"path": path, "rel_path": rel_path, "name": p.name}
+
+    reader = READERS.get(ext)
+    if not reader:
+        return {**result, "error": f"[skip] Extensión no soportada: {p.name}"}
+
+    try:
+        raw = reader(p)
+    except Exception as e:
+        return {**result, "error": f"[error] Leyendo {p.name}: {e}"}
+
+    text = norm_ws(raw)
+    if not text:
+        return {**result, "error": f"[skip] Vacío: {p.name}"}
+
+    chunks = chunk_text(text)
+    if not chunks:
+        return {**result, "error": f"[skip] Sin chunks: {p.name}"}
+
+    stat = p.stat()
+    return {
+        **result,
+        "doc_id": sha1(rel_path),  # id estable por ruta relativa
+        "ext": ext,
+        "title": p.stem,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "hash": file_sha1(p),
+        "chunks": chunks,
+        "chunk_hashes": [sha1(chunk) for chunk in chunks],
+    }
@@ -0,0 +1,97 @@
+import sys
+from typing import List, Sequence, Tuple
+
+from sentence_transformers import CrossEncoder
+
+
+class Reranker:
+    """
+    Cross-encoder que puntúa cada par (pregunta, pasaje) en una sola llamada por lotes.
+    Más lento que la búsqueda vectorial pero mucho más preciso, por eso se aplica solo a
+    los candidatos que devuelve Qdrant.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 16):
+        self.model = CrossEncoder(model_name)
+        self.batch_size = batch_size
+
+    def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        """
+        Relevancia de cada pasaje entre 0 y 1. Con una sola etiqueta (bge-reranker)
+        predict() ya aplica la sigmoide: no hay que volver a aplicarla.
+        """
+        if not passages:
+            return []
+        scores = self.model.predict([(query, p) for p in passages], batch_size=self.batch_size)
+        return [float(x) for x in scores]
+
+    def check_calibration(self, min_score: float) -> bool:
+        """
+        Comprueba que un pasaje claramente irrelevante puntúa por debajo de `min_score`.
+        Si no, los cortes de pack_context nunca se activarían (p. ej. un modelo cuyo
+        predict() no devuelve probabilidades).
+        """
+        score = self.score(
+            "¿Cuál es la capital de Francia?",
+            ["La fotosíntesis convierte la luz solar en energía química en las plantas."]
+        )[0]
+        if score >= min_score:
+            print(f"WARN: Reranker scores an irrelevant passage at {score:.3f} "
+                  f"(>= RERANK_MIN_SCORE={min_score}); early cut-off will not work",
+                  file=sys.stderr)
+            return False
+        return True
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.model.tokenizer.encode(text, add_special_tokens=False))
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        tokenizer = self.model.tokenizer
+        ids = tokenizer.encode(text, add_special_tokens=False)[:max_tokens]
+        return tokenizer.decode(ids).rsplit(" ", 1)[0] + "..."
+
+
+def pack_context(
+    passages: Sequence[str],
+    scores: Sequence[float],
+    max_passages: int,
+    budget_tokens: int,
+    count_tokens,
+    truncate_tokens,
+    min_score: float = 0.1,
+    relative_cutoff: float = 0.3,
+    min_tail_tokens: int = 64
+) -> List[Tuple[int, str]]:
+    """
+    Elige qué pasajes entran en el contexto. Devuelve [(índice, texto)] de mayor a menor
+    relevancia.
+
+    El mejor siempre entra; el resto se recorre por puntuación y se para en cuanto:
+    - se llega a `max_passages`,
+    - la puntuación baja de `min_score` o de `relative_cutoff` veces la del mejor (el
+      resto aporta poco y solo alarga el prompt),
+    - o se agota el presupuesto de tokens. El último pasaje se recorta si aún quedan al
+      menos `min_tail_tokens`.
+    """
+    order = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+    if not order:
+        return []
+
+    best = scores[order[0]]
+    selected = []
+    remaining = budget_tokens
+    for i in order:
+        if len(selected) >= max_passages or remaining <= 0:
+            break
+        if selected and (scores[i] < min_score or scores[i] < best * relative_cutoff):
+            break
+        text = passages[i]
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            if remaining < min_tail_tokens:
+                break
+            text = truncate_tokens(text, remaining)
+            tokens = remaining
+        selected.append((i, text))
+        remaining -= tokens
+    return selected
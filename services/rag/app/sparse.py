@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client import models
+
+# Nombre del vector disperso en la colección (el denso sigue siendo el vector sin nombre)
+SPARSE_VECTOR_NAME = "sparse"
+
+
+class HybridEncoder:
+    """
+    BGE-M3 de FlagEmbedding: vector denso y pesos léxicos (un peso por token relevante
+    del texto) en una sola pasada del modelo.
+
+    Con la búsqueda híbrida sustituye al SentenceTransformer, así solo hay una copia del
+    modelo en memoria. encode() tiene la misma interfaz que SentenceTransformer.encode
+    (solo densos, normalizados) para encode_chunks y la caché de vectores.
+    """
+
+    def __init__(self, model_name: str):
+        from FlagEmbedding import BGEM3FlagModel
+        self.model = BGEM3FlagModel(model_name, use_fp16=False)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        return self._encode(texts, batch_size, sparse=False)[0]
+
+    def encode_hybrid(self, texts: Sequence[str], batch_size: int = 32) -> Tuple[np.ndarray, List[models.SparseVector]]:
+        """(densos, dispersos) de `texts` con una sola llamada al modelo."""
+        return self._encode(texts, batch_size, sparse=True)
+
+    def _encode(self, texts: Sequence[str], batch_size: int, sparse: bool):
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32), []
+        output = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            return_dense=True,
+            return_sparse=sparse,
+            return_colbert_vecs=False
+        )
+        dense = np.asarray(output["dense_vecs"], dtype=np.float32)
+        lexical = [to_sparse_vector(weights) for weights in output["lexical_weights"]] if sparse else []
+        return dense, lexical
+
+
+def to_sparse_vector(weights: Dict) -> models.SparseVector:
+    """{token_id: peso} -> SparseVector (Qdrant exige índices enteros)."""
+    items = sorted((int(token), float(weight)) for token, weight in weights.items() if weight > 0)
+    return models.SparseVector(
+        indices=[token for token, _ in items],
+        values=[weight for _, weight in items]
+    )
+
+
+def open_hybrid_encoder(model_name: str) -> Optional[HybridEncoder]:
+    """HybridEncoder o None si FlagEmbedding no está instalado (la búsqueda híbrida es opcional)."""
+    try:
+        return HybridEncoder(model_name)
+    except ImportError:
+        print("[warn] FlagEmbedding no está instalado: búsqueda híbrida desactivada")
+        return None
+
+
+def sparse_vectors_config() -> dict:
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams()}
+
+
+def rrf_fuse(result_lists: Sequence[Sequence], limit: int, k: int = 60) -> list:
+    """
+    Reciprocal Rank Fusion: cada resultado suma 1 / (k + posición) en cada lista en la
+    que aparece. Solo usa posiciones, así que no hace falta que las puntuaciones densas
+    (coseno) y dispersas (producto escalar) estén en la misma escala.
+    """
+    scores = {}
+    hits = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            scores[hit.id] = scores.get(hit.id, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit.id, hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [hits[point_id] for point_id in ranked]
+
+
+def collection_has_sparse(client, collection: str) -> bool:
+    """La colección se creó con el vector disperso (las anteriores a la búsqueda híbrida no)."""
+    try:
+        params = client.get_collection(collection).config.params
+    except Exception:
+        return False
+    return SPARSE_VECTOR_NAME in (params.sparse_vectors or {})
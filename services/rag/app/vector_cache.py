@@ -0,0 +1,145 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Sequence
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings en SQLite, compartida entre procesos.
+
+    - Clave: sha1(modelo + texto), así cambiar de modelo no devuelve vectores ajenos.
+    - Los vectores se guardan como bytes float16 (o float32) y se devuelven en float32:
+      ~2 KB por vector de 1024 dims en lugar de ~32 KB como tupla de floats de Python.
+    - La base está en modo WAL: main.py e ingest.py pueden leer y escribir a la vez.
+    - Como mucho `max_entries` vectores; al pasarse un 10 % se borran los usados hace
+      más tiempo.
+    """
+
+    def __init__(self, path: str, model_name: str, dtype: str = "float16", max_entries: int = 100_000):
+        self.path = path
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\n{text}".encode("utf-8", errors="ignore")).hexdigest()
+
+    # --- API ---
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[list], np.ndarray]) -> np.ndarray:
+        """Vectores de `texts`: los que están en caché se leen, el resto pasa por `encode_fn`."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        keys = [self.key(t) for t in texts]
+        found = self.get_many(keys)
+        # Un índice por clave que falta: los textos repetidos se codifican una vez
+        missing = list({k: i for i, k in enumerate(keys) if k not in found}.values())
+
+        fresh = {}
+        if missing:
+            vectors = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            fresh = {keys[i]: vec for i, vec in zip(missing, vectors)}
+            self.put_many(fresh)
+
+        return np.stack([found[k] if k in found else fresh[k] for k in keys])
+
+    def get_many(self, keys: Sequence[str]) -> dict:
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for key, dtype, blob in self._db.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({marks})", part
+                ):
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._db.commit()
+            self._hits += len(found)
+            self._misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, vectors: dict):
+        if not vectors:
+            return
+        now = time.time()
+        rows = [
+            (key, self.dtype.str, np.asarray(vec, dtype=self.dtype).tobytes(), now)
+            for key, vec in vectors.items()
+        ]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+            self._count += len(rows)
+            if self._count > self.max_entries * 1.1:
+                self._evict()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "dtype": self.dtype.name,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- Internos ---
+    def _evict(self):
+        # Otro proceso pudo haber escrito: se recuenta antes de borrar
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._db.commit()
+        self._count -= excess
+
+
+def open_cache(path: str, model_name: str, dtype: str = "float16", max_entries: int = 100_000):
+    """EmbeddingCache o None si `path` está vacío o no se puede abrir (la caché es opcional)."""
+    if not path:
+        return None
+    try:
+        return EmbeddingCache(path, model_name, dtype, max_entries)
+    except Exception as e:
+        print(f"[warn] Caché de embeddings desactivada ({path}): {e}")
+        return None
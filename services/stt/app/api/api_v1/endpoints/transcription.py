@@ -1,11 +1,12 @@
-import shutil
-import tempfile
-import os
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+import io
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from fastapi.responses import JSONResponse
 
 from app.api.deps import get_transcriber
+from app.services.audio import is_raw_pcm, wav_pcm16_frames
+from app.services.profiles import get_profile
 from app.services.transcriber import TranscriberService
+from app.services.worker_pool import TranscriberBusyError
 from app.schemas.transcription import TranscriptionResponse
 
 router = APIRouter()
@@ -13,30 +14,39 @@ router = APIRouter()
 @router.post("/transcribe", response_model=TranscriptionResponse, summary="Transcribe audio file")
 async def transcribe_audio_file(
     audio_file: UploadFile = File(...),
+    profile: str | None = Form(None),
     transcriber: TranscriberService = Depends(get_transcriber)
 ):
     """
     Upload an audio file and return its transcription.
-    
+
     - **audio_file**: The audio file to transcribe (formats supported by FFMPEG).
+      16 kHz 16-bit mono WAV, or raw PCM (`audio/l16`, `.raw`, `.pcm`), skips decoding entirely.
+    - **profile**: Decoding profile, `fast` or `accurate` (default: DEFAULT_PROFILE).
     """
-    temp_dir = tempfile.mkdtemp()
-    temp_audio_path = os.path.join(temp_dir, audio_file.filename or "temp_audio")
-    
     try:
-        # Save uploaded file
-        with open(temp_audio_path, "wb") as buffer:
-            shutil.copyfileobj(audio_file.file, buffer)
-        
+        decoding_profile = get_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        data = await audio_file.read()
+
+        # Fast path: already 16 kHz int16, hand the samples over without touching disk or ffmpeg
+        if is_raw_pcm(audio_file.content_type, audio_file.filename):
+            audio = data
+        else:
+            audio = wav_pcm16_frames(data)
+            if audio is None:
+                # Any other format is decoded from memory
+                audio = io.BytesIO(data)
+
         # Transcribe (non-blocking)
-        transcription_text = await transcriber.transcribe_file(temp_audio_path)
-        
+        transcription_text = await transcriber.transcribe_audio(audio, decoding_profile)
+
         return TranscriptionResponse(transcription=transcription_text)
 
+    except TranscriberBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-        
-    finally:
-        # Cleanup
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
@@ -1,11 +1,13 @@
+import asyncio
 import json
-import tempfile
-import os
-import shutil
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 
 from app.api.deps import get_transcriber
+from app.core.config import settings
 from app.services.transcriber import TranscriberService
+from app.services.profiles import get_profile
+from app.services.streaming import StreamingSession
+from app.services.vad import SpeechEndpointer
 
 router = APIRouter()
 
@@ -16,52 +18,156 @@ async def websocket_transcription(
 ):
     """
     WebSocket endpoint for real-time transcription.
-    Expects binary audio data or JSON control messages.
+    Expects binary audio data (16 kHz, 16-bit mono PCM) or JSON control messages:
+
+    - {"action": "start", "streaming": bool, "vad": bool, "endpoint_events": bool, "profile": str}:
+      begins a new utterance. `profile` selects the decoding profile (default: DEFAULT_PROFILE). When streaming is enabled (default: STREAMING_PARTIALS)
+      audio is transcribed as it arrives and {"partial": ..., "stable": ...} messages
+      are pushed to the client. With VAD enabled, leading/trailing silence is trimmed
+      before decoding and {"event": "endpoint"} is sent once the speaker goes quiet.
+    - {"action": "stop"}: finalizes the utterance and returns {"transcript": ...}.
     """
     await websocket.accept()
-    
+
     audio_buffer = bytearray()
-    temp_dir = tempfile.mkdtemp()
-    
+
+    streaming = settings.STREAMING_PARTIALS
+    session = StreamingSession(transcriber)
+    decode_task: asyncio.Task | None = None
+    profile = get_profile()
+
+    use_vad = settings.VAD_ENABLED
+    endpoint_events = settings.VAD_ENDPOINT_EVENTS
+    endpointer = SpeechEndpointer()
+    endpoint_sent = False
+    # Audio kept from before speech starts so the first syllable isn't clipped
+    preroll = bytearray()
+    preroll_bytes = endpointer.padding_samples * 2
+
+    async def send_partial():
+        try:
+            result = await session.process()
+            await websocket.send_text(json.dumps(result))
+        except Exception as e:
+            print(f"Partial transcription failed: {e}")
+
     try:
         while True:
             data = await websocket.receive()
-            
-            if "bytes" in data:
-                audio_buffer.extend(data["bytes"])
-            
-            elif "text" in data:
+
+            if data.get("type") == "websocket.disconnect":
+                break
+
+            if data.get("bytes") is not None:
+                chunk = data["bytes"]
+
+                if use_vad:
+                    endpointer.feed(chunk)
+                    if endpointer.endpoint:
+                        if endpoint_events and not endpoint_sent:
+                            endpoint_sent = True
+                            await websocket.send_text(json.dumps({"event": "endpoint"}))
+                    else:
+                        endpoint_sent = False
+
+                if streaming:
+                    if use_vad:
+                        if not endpointer.speech_started:
+                            preroll.extend(chunk)
+                            del preroll[:max(0, len(preroll) - preroll_bytes)]
+                            continue
+                        if preroll:
+                            session.insert_audio(preroll)
+                            preroll.clear()
+                        if endpointer.endpoint:
+                            # Trailing silence is not worth decoding
+                            continue
+
+                    session.insert_audio(chunk)
+                    # Only one decode in flight; audio keeps accumulating meanwhile
+                    if session.ready() and (decode_task is None or decode_task.done()):
+                        decode_task = asyncio.create_task(send_partial())
+                else:
+                    audio_buffer.extend(chunk)
+
+            elif data.get("text") is not None:
                 try:
                     message = json.loads(data["text"])
                 except json.JSONDecodeError:
                     continue
 
-                if message.get("action") == "stop":
-                    if not audio_buffer:
+                if message.get("action") == "start":
+                    # An unknown profile is reported but still starts a clean utterance
+                    # with the current one, so nothing from the previous one leaks in
+                    try:
+                        profile = get_profile(message.get("profile"))
+                    except ValueError as e:
+                        await websocket.send_text(json.dumps({"error": str(e)}))
+                    session.profile = profile
+
+                    if decode_task:
+                        decode_task.cancel()
+                        decode_task = None
+                    streaming = bool(message.get("streaming", settings.STREAMING_PARTIALS))
+                    use_vad = bool(message.get("vad", settings.VAD_ENABLED))
+                    endpoint_events = bool(message.get("endpoint_events", settings.VAD_ENDPOINT_EVENTS))
+                    session.reset()
+                    endpointer.reset()
+                    endpoint_sent = False
+                    preroll.clear()
+                    audio_buffer.clear()
+
+                elif message.get("action") == "stop":
+                    speech_bounds = endpointer.speech_bounds() if use_vad else None
+                    no_speech = use_vad and speech_bounds is None
+                    endpointer.reset()
+                    endpoint_sent = False
+                    preroll.clear()
+
+                    if no_speech:
+                        if decode_task:
+                            decode_task.cancel()
+                            decode_task = None
+                        session.reset()
+                        audio_buffer.clear()
+                        await websocket.send_text(json.dumps({"transcript": "", "message": "No speech detected."}))
+
+                    elif streaming:
+                        if decode_task:
+                            await decode_task
+                            decode_task = None
+
+                        if not session.has_audio:
+                            await websocket.send_text(json.dumps({"transcript": "", "message": "No audio received."}))
+                        else:
+                            # Only the unconfirmed tail of the window is decoded here
+                            try:
+                                transcription = await session.finish()
+                                await websocket.send_text(json.dumps({"transcript": transcription}))
+                            except Exception as e:
+                                session.reset()
+                                await websocket.send_text(json.dumps({"error": str(e)}))
+
+                    elif not audio_buffer:
                         await websocket.send_text(json.dumps({"transcript": "", "message": "No audio received."}))
                         # Continue or break depending on requirement. Here we'll clear buffer and wait for more.
                         # If the intention is to close connection after one transcription, use break.
                         # For now, let's allow multiple transcriptions in one session.
                     else:
-                        # Save buffer to file as WAV
-                        temp_audio_path = os.path.join(temp_dir, "stream.wav")
-                        import wave
-                        with wave.open(temp_audio_path, 'wb') as wf:
-                            wf.setnchannels(1)
-                            wf.setsampwidth(2) # 16-bit
-                            wf.setframerate(16000)
-                            wf.writeframes(audio_buffer)
-                        
-                        # Transcribe
+                        audio = audio_buffer
+                        if speech_bounds:
+                            # Only decode the voiced region (plus padding)
+                            start, end = speech_bounds
+                            audio = audio_buffer[start * 2:end * 2]
+
+                        # Transcribe straight from the received PCM buffer (no temp WAV)
                         try:
-                            # Note: In a real streaming scenario, we might want to transcribe chunks.
-                            # Here we follow the existing logic of transcribing the whole buffer on "stop".
-                            transcription = await transcriber.transcribe_file(temp_audio_path)
+                            transcription = await transcriber.transcribe_audio(audio, profile)
                             response = {"transcript": transcription}
                             await websocket.send_text(json.dumps(response))
                         except Exception as e:
                             await websocket.send_text(json.dumps({"error": str(e)}))
-                        
+
                         # Reset buffer
                         audio_buffer.clear()
 
@@ -71,7 +177,7 @@ async def websocket_transcription(
         # Try to send error if connection is still open
         if websocket.client_state.name != 'DISCONNECTED':
              await websocket.send_text(json.dumps({"error": str(e)}))
-            
+
     finally:
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        if decode_task and not decode_task.done():
+            decode_task.cancel()
@@ -10,6 +10,29 @@ class Settings(BaseSettings):
     DEVICE: str = "cpu"
     MODELS_DIR: str = "./models"
     LANGUAGE: str | None = None
+    DEFAULT_PROFILE: str = "fast"  # Decoding profile: fast (greedy, int8) | accurate (beam 5, float32)
+    SAMPLE_RATE: int = 16000
+
+    # Worker Pool Settings
+    NUM_WORKERS: int = 2  # Concurrent transcriptions (CTranslate2 num_workers)
+    CPU_THREADS: int = 0  # Threads per worker; 0 = split the available cores between workers
+    QUEUE_SIZE: int = 16  # Pending requests allowed before rejecting with 503
+    BATCH_MAX_SIZE: int = 4  # Short utterances decoded together in one batch
+    BATCH_WINDOW_MS: int = 15  # Max wait for batch companions when the pool is busy
+
+    # Streaming (rolling window) Settings
+    STREAMING_PARTIALS: bool = True
+    STREAMING_MIN_CHUNK_SEC: float = 1.0
+    STREAMING_MAX_WINDOW_SEC: float = 15.0
+
+    # Voice Activity Detection (endpointing / silence trimming)
+    VAD_ENABLED: bool = True
+    VAD_AGGRESSIVENESS: int = 2  # 0 (least aggressive) - 3 (most aggressive)
+    VAD_FRAME_MS: int = 30  # WebRTC VAD accepts 10, 20 or 30 ms frames
+    VAD_MIN_SPEECH_MS: int = 90
+    VAD_ENDPOINT_SILENCE_MS: int = 800
+    VAD_PADDING_MS: int = 200
+    VAD_ENDPOINT_EVENTS: bool = True
 
     class Config:
         env_file = ".env"
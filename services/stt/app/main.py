@@ -34,4 +34,4 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/health", tags=["health"])
 async def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "workers": get_transcriber_service().pool.stats()}
@@ -0,0 +1,59 @@
+import struct
+import numpy as np
+
+from app.core.config import settings
+
+RAW_PCM_CONTENT_TYPES = {"audio/l16", "audio/pcm", "audio/x-raw"}
+RAW_PCM_EXTENSIONS = (".raw", ".pcm")
+
+
+def pcm16_to_float32(pcm) -> np.ndarray:
+    """
+    Converts 16-bit mono PCM (bytes, bytearray, memoryview or int16 array) into the
+    float32 [-1, 1] array Whisper expects. The int16 view over the input is zero-copy;
+    the only allocation is the float32 output, which is scaled in place.
+    """
+    if not isinstance(pcm, np.ndarray) and len(pcm) % 2:
+        pcm = memoryview(pcm)[:-1]  # Drop a trailing half sample
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+
+def wav_pcm16_frames(data: bytes) -> memoryview | None:
+    """
+    Returns a zero-copy view over the sample frames when `data` is a PCM WAV file that
+    is already 16-bit mono at settings.SAMPLE_RATE, or None if it needs resampling/decoding.
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+
+    fmt_ok = False
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        body = pos + 8
+
+        if chunk_id == b"fmt " and size >= 16:
+            fmt_tag, channels, rate = struct.unpack_from("<HHI", data, body)
+            bits = struct.unpack_from("<H", data, body + 14)[0]
+            fmt_ok = fmt_tag == 1 and channels == 1 and rate == settings.SAMPLE_RATE and bits == 16
+        elif chunk_id == b"data":
+            if not fmt_ok:
+                return None
+            # Streaming writers may leave the size unset; clamp to what we actually have
+            end = min(body + size, len(data))
+            end -= (end - body) % 2
+            return memoryview(data)[body:end]
+
+        pos = body + size + (size & 1)
+
+    return None
+
+
+def is_raw_pcm(content_type: str | None, filename: str | None) -> bool:
+    """True when an upload is declared as headerless 16 kHz 16-bit mono PCM."""
+    if content_type and content_type.split(";")[0].strip().lower() in RAW_PCM_CONTENT_TYPES:
+        return True
+    return bool(filename) and filename.lower().endswith(RAW_PCM_EXTENSIONS)
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class DecodingProfile:
+    """Named set of Whisper decoding options."""
+    name: str
+    beam_size: int
+    compute_type: str
+    without_timestamps: bool
+    condition_on_previous_text: bool
+    vad_filter: bool
+    temperature: tuple[float, ...]
+
+
+def _build_profiles() -> dict[str, DecodingProfile]:
+    cpu = settings.DEVICE == "cpu"
+    profiles = [
+        # Short voice commands: greedy, int8, one pass (no temperature fallback re-decodes).
+        # Silence is already trimmed by our own VAD, so Whisper's is skipped.
+        DecodingProfile(
+            name="fast",
+            beam_size=1,
+            compute_type="int8" if cpu else "int8_float16",
+            without_timestamps=True,
+            condition_on_previous_text=False,
+            vad_filter=False,
+            temperature=(0.0,),
+        ),
+        # Long dictation / uploaded files: faster-whisper's own defaults.
+        DecodingProfile(
+            name="accurate",
+            beam_size=5,
+            compute_type="float32" if cpu else "float16",
+            without_timestamps=False,
+            condition_on_previous_text=True,
+            vad_filter=True,
+            temperature=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        ),
+    ]
+    return {profile.name: profile for profile in profiles}
+
+
+PROFILES = _build_profiles()
+
+
+def get_profile(name: str | None = None) -> DecodingProfile:
+    """Returns the named profile (DEFAULT_PROFILE when None). Raises ValueError if unknown."""
+    name = name or settings.DEFAULT_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown decoding profile '{name}'. Available: {', '.join(PROFILES)}")
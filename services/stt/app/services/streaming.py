@@ -0,0 +1,132 @@
+import numpy as np
+
+from app.core.config import settings
+from app.services.audio import pcm16_to_float32
+from app.services.profiles import DecodingProfile
+from app.services.transcriber import TranscriberService
+
+# (start, end, text) in seconds from the beginning of the utterance
+Word = tuple[float, float, str]
+
+
+def _normalize(word: str) -> str:
+    return word.strip().lower().strip(".,!?;:¿¡\"'")
+
+
+def _join(words: list[Word]) -> str:
+    return "".join(text for _, _, text in words).strip()
+
+
+class StreamingSession:
+    """
+    Rolling-window transcription of a single utterance.
+
+    The audio window is re-decoded every STREAMING_MIN_CHUNK_SEC of new audio.
+    A word is confirmed once two consecutive hypotheses agree on it, so the
+    stable prefix never changes. Audio behind the last confirmed word is dropped
+    once the window grows past STREAMING_MAX_WINDOW_SEC, which keeps each decode
+    (and the final one on "stop") bounded to the unconfirmed tail.
+    """
+
+    def __init__(self, transcriber: TranscriberService):
+        self.transcriber = transcriber
+        self.sample_rate = settings.SAMPLE_RATE
+        self.min_chunk_samples = int(settings.STREAMING_MIN_CHUNK_SEC * self.sample_rate)
+        self.max_window_samples = int(settings.STREAMING_MAX_WINDOW_SEC * self.sample_rate)
+        self.profile: DecodingProfile | None = None  # None = transcriber default
+        self.reset()
+
+    def reset(self):
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.window_offset = 0.0  # Seconds already trimmed from the front of the window
+        self.committed: list[Word] = []
+        self.hypothesis: list[Word] = []
+        self._pending_samples = 0
+        self._odd_byte = b""
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio.size > 0 or bool(self.committed)
+
+    @property
+    def committed_end(self) -> float:
+        return self.committed[-1][1] if self.committed else 0.0
+
+    def insert_audio(self, pcm: bytes):
+        """Appends 16-bit mono PCM to the window."""
+        # Clients may split frames on odd byte boundaries
+        if self._odd_byte:
+            pcm = self._odd_byte + pcm
+            self._odd_byte = b""
+        if len(pcm) % 2:
+            pcm, self._odd_byte = pcm[:-1], pcm[-1:]
+
+        samples = pcm16_to_float32(pcm)
+        self.audio = np.concatenate((self.audio, samples))
+        self._pending_samples += samples.size
+
+    def ready(self) -> bool:
+        """True once enough new audio has arrived to justify another decode."""
+        return self._pending_samples >= self.min_chunk_samples
+
+    async def _decode_window(self) -> list[Word]:
+        audio = self.audio
+        offset = self.window_offset
+        prompt = _join(self.committed)[-200:] or None
+
+        words = await self.transcriber.transcribe_words(audio, prompt, self.profile)
+
+        last_end = self.committed_end
+        words = [(start + offset, end + offset, text) for start, end, text in words if start + offset > last_end - 0.1]
+
+        # Whisper sometimes repeats the tail of the confirmed text at the start of the window
+        for n in range(min(5, len(self.committed), len(words)), 0, -1):
+            tail = [_normalize(w[2]) for w in self.committed[-n:]]
+            head = [_normalize(w[2]) for w in words[:n]]
+            if tail == head:
+                return words[n:]
+        return words
+
+    def _trim_window(self):
+        if self.audio.size <= self.max_window_samples:
+            return
+
+        # Nothing agreed on within the whole window: force-commit so memory stays bounded
+        if not self.committed or self.committed_end <= self.window_offset:
+            self.committed.extend(self.hypothesis)
+            self.hypothesis = []
+
+        cut = int((self.committed_end - self.window_offset) * self.sample_rate)
+        if cut <= 0:
+            # No words at all (long silence): keep only the most recent chunk
+            cut = self.audio.size - self.min_chunk_samples
+        if cut > 0:
+            self.audio = self.audio[cut:]
+            self.window_offset += cut / self.sample_rate
+
+    async def process(self) -> dict:
+        """Decodes the current window and returns a partial result message."""
+        self._pending_samples = 0
+        words = await self._decode_window()
+
+        confirmed = []
+        for new, old in zip(words, self.hypothesis):
+            if _normalize(new[2]) != _normalize(old[2]):
+                break
+            confirmed.append(new)
+
+        self.committed.extend(confirmed)
+        self.hypothesis = words[len(confirmed):]
+        self._trim_window()
+
+        return {
+            "partial": _join(self.committed + self.hypothesis),
+            "stable": _join(self.committed),
+        }
+
+    async def finish(self) -> str:
+        """Decodes the unconfirmed tail and returns the full transcript."""
+        words = await self._decode_window() if self.audio.size else []
+        transcript = _join(self.committed + words)
+        self.reset()
+        return transcript
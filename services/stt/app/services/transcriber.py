@@ -1,57 +1,207 @@
-import asyncio
 import os
-from functools import partial
+import threading
+from typing import BinaryIO
+import numpy as np
 from faster_whisper import WhisperModel
 from app.core.config import settings
+from app.services.audio import pcm16_to_float32
+from app.services.profiles import DecodingProfile, get_profile
+from app.services.worker_pool import TranscriptionPool
+
+# Whisper decodes 30 s windows; anything shorter fits in one batched decode
+BATCH_MAX_SAMPLES = 30 * settings.SAMPLE_RATE
+
+# A file path or file-like object (decoded by faster-whisper), raw 16 kHz 16-bit mono PCM,
+# or a 16 kHz int16/float32 NumPy array.
+AudioInput = str | BinaryIO | bytes | bytearray | memoryview | np.ndarray
 
 class TranscriberService:
     def __init__(self):
         self.model_size = settings.MODEL_SIZE
         self.device = settings.DEVICE
-        self.compute_type = "default"
         self.models_dir = settings.MODELS_DIR
         self.language = settings.LANGUAGE
+        self.default_profile = get_profile()
+        self.num_workers = max(1, settings.NUM_WORKERS)
+        # Split the cores between workers instead of letting each one grab all of them
+        self.cpu_threads = settings.CPU_THREADS or max(1, (os.cpu_count() or 1) // self.num_workers)
 
         if not os.path.exists(self.models_dir):
             os.makedirs(self.models_dir)
 
-        print(f"Loading Whisper model: {self.model_size} on {self.device}...")
-        self.model = WhisperModel(
-            self.model_size, 
-            device=self.device, 
-            compute_type=self.compute_type,
-            download_root=self.models_dir
+        # compute_type is fixed when the model is loaded, so each one a profile asks for
+        # gets its own instance. The default profile's model is loaded eagerly.
+        self._models: dict[str, WhisperModel] = {}
+        self._models_lock = threading.Lock()
+        self.model = self._get_model(self.default_profile.compute_type)
+
+        self.pool = TranscriptionPool(
+            workers=self.num_workers,
+            queue_size=settings.QUEUE_SIZE,
+            batch_fn=self._transcribe_batch_sync,
+            batch_max_size=settings.BATCH_MAX_SIZE,
+            batch_window=settings.BATCH_WINDOW_MS / 1000
         )
-        print("Whisper model loaded successfully.")
 
-    def _transcribe_sync(self, file_path: str) -> str:
+    def _get_model(self, compute_type: str) -> WhisperModel:
+        with self._models_lock:
+            if compute_type not in self._models:
+                print(f"Loading Whisper model: {self.model_size} ({compute_type}) on {self.device} "
+                      f"({self.num_workers} workers x {self.cpu_threads} threads)...")
+                self._models[compute_type] = WhisperModel(
+                    self.model_size,
+                    device=self.device,
+                    compute_type=compute_type,
+                    download_root=self.models_dir,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers
+                )
+                print("Whisper model loaded successfully.")
+            return self._models[compute_type]
+
+    @staticmethod
+    def _as_model_input(audio: AudioInput):
+        """
+        Normalizes in-memory audio to float32 so Whisper skips its ffmpeg decode.
+        Paths and file-like objects are passed through untouched.
+        """
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            return pcm16_to_float32(audio)
+        if isinstance(audio, np.ndarray):
+            if audio.dtype == np.int16:
+                return pcm16_to_float32(audio)
+            # No copy when the array is already contiguous float32
+            return np.ascontiguousarray(audio, dtype=np.float32)
+        return audio
+
+    def _transcribe_sync(self, audio: AudioInput, profile: DecodingProfile) -> str:
         """
         Synchronous wrapper for the blocking transcribe method.
         """
-        segments, info = self.model.transcribe(
-            file_path,
-            beam_size=5,
-            language=self.language
+        segments, info = self._get_model(profile.compute_type).transcribe(
+            self._as_model_input(audio),
+            beam_size=profile.beam_size,
+            language=self.language,
+            without_timestamps=profile.without_timestamps,
+            condition_on_previous_text=profile.condition_on_previous_text,
+            vad_filter=profile.vad_filter,
+            temperature=list(profile.temperature)
         )
 
         if self.language:
-            print(f"Specified language: '{self.language}'")
+            print(f"Specified language: '{self.language}' (profile: {profile.name})")
         else:
-            print(f"Detected language: '{info.language}' with probability {info.language_probability}")
+            print(f"Detected language: '{info.language}' with probability {info.language_probability} (profile: {profile.name})")
 
         transcription = "".join(segment.text for segment in segments)
         return transcription.strip()
 
-    async def transcribe_file(self, file_path: str) -> str:
+    def _batch_key(self, audio: AudioInput, profile: DecodingProfile) -> str | None:
         """
-        Asynchronous wrapper that runs the blocking transcription in a separate thread.
+        Short in-memory utterances with a fixed language can share a batched decode
+        with others using the same profile. Language detection happens per file, so
+        auto-detect requests run alone.
         """
-        loop = asyncio.get_running_loop()
-        # Run the synchronous method in a thread pool to avoid blocking the event loop
-        return await loop.run_in_executor(
-            None, 
-            partial(self._transcribe_sync, file_path)
+        if not self.language:
+            return None
+        if isinstance(audio, np.ndarray):
+            samples = audio.size
+        elif isinstance(audio, (bytes, bytearray, memoryview)):
+            samples = len(audio) // 2
+        else:
+            return None
+        return profile.name if samples <= BATCH_MAX_SAMPLES else None
+
+    def _transcribe_batch_sync(self, jobs: list[tuple[AudioInput, DecodingProfile]]) -> list[str]:
+        """
+        Transcribes several short utterances with a single batched encoder/decoder pass.
+        All jobs share a profile. Falls back to one-by-one decoding if the batched path fails.
+        """
+        profile = jobs[0][1]
+        try:
+            return self._generate_batch([self._as_model_input(audio) for audio, _ in jobs], profile)
+        except Exception as e:
+            print(f"Batched decode failed ({e}), falling back to sequential decoding.")
+            return [self._transcribe_sync(audio, profile) for audio, _ in jobs]
+
+    def _generate_batch(self, audios: list[np.ndarray], profile: DecodingProfile) -> list[str]:
+        from faster_whisper.tokenizer import Tokenizer
+
+        model = self._get_model(profile.compute_type)
+        extractor = model.feature_extractor
+        features = []
+        for audio in audios:
+            padded = np.zeros(extractor.n_samples, dtype=np.float32)
+            padded[:audio.size] = audio[:extractor.n_samples]
+            features.append(extractor(padded)[:, :extractor.nb_max_frames])
+
+        encoder_output = model.encode(np.stack(features))
+        tokenizer = Tokenizer(
+            model.hf_tokenizer,
+            model.model.is_multilingual,
+            task="transcribe",
+            language=self.language
         )
+        prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+        results = model.model.generate(
+            encoder_output,
+            [prompt] * len(audios),
+            beam_size=profile.beam_size,
+            max_length=model.max_length
+        )
+        print(f"Batched decode of {len(audios)} utterances (profile: {profile.name}).")
+        return [tokenizer.decode(result.sequences_ids[0]).strip() for result in results]
+
+    def _transcribe_words_sync(
+        self,
+        audio: np.ndarray,
+        initial_prompt: str | None,
+        profile: DecodingProfile
+    ) -> list[tuple[float, float, str]]:
+        """
+        Transcribes a float32 16 kHz window and returns (start, end, word) tuples
+        relative to the start of the window. Used by the rolling-window streaming mode.
+        """
+        segments, _ = self._get_model(profile.compute_type).transcribe(
+            audio,
+            beam_size=profile.beam_size,
+            language=self.language,
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            temperature=list(profile.temperature),
+            initial_prompt=initial_prompt
+        )
+        return [(word.start, word.end, word.word) for segment in segments for word in (segment.words or [])]
+
+    async def transcribe_words(
+        self,
+        audio: np.ndarray,
+        initial_prompt: str | None = None,
+        profile: DecodingProfile | None = None
+    ) -> list[tuple[float, float, str]]:
+        """
+        Asynchronous wrapper around _transcribe_words_sync, run on the worker pool.
+        """
+        profile = profile or self.default_profile
+        return await self.pool.submit(self._transcribe_words_sync, audio, initial_prompt, profile)
+
+    async def transcribe_audio(self, audio: AudioInput, profile: DecodingProfile | None = None) -> str:
+        """
+        Asynchronous wrapper that runs the blocking transcription on the worker pool.
+        Accepts in-memory PCM/NumPy audio as well as paths and file-like objects.
+        Raises TranscriberBusyError when the admission queue is full.
+        """
+        profile = profile or self.default_profile
+        return await self.pool.submit(
+            self._transcribe_sync, audio, profile,
+            batch_key=self._batch_key(audio, profile)
+        )
+
+    async def transcribe_file(self, file_path: str, profile: DecodingProfile | None = None) -> str:
+        """
+        Transcribes an audio file on disk.
+        """
+        return await self.transcribe_audio(file_path, profile)
 
 # Global instance
 _transcriber_instance = None
@@ -0,0 +1,73 @@
+import webrtcvad
+
+from app.core.config import settings
+
+
+class SpeechEndpointer:
+    """
+    Frame-level voice activity tracking for one utterance.
+
+    Incoming PCM is cut into VAD_FRAME_MS frames and classified with WebRTC VAD.
+    Speech starts after VAD_MIN_SPEECH_MS of consecutive voiced frames (so clicks
+    don't count) and the utterance is considered finished once VAD_ENDPOINT_SILENCE_MS
+    of silence follows the last voiced frame.
+    """
+
+    def __init__(self):
+        self.sample_rate = settings.SAMPLE_RATE
+        self.frame_ms = settings.VAD_FRAME_MS
+        self.frame_samples = self.sample_rate * self.frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.min_speech_frames = max(1, settings.VAD_MIN_SPEECH_MS // self.frame_ms)
+        self.endpoint_frames = max(1, settings.VAD_ENDPOINT_SILENCE_MS // self.frame_ms)
+        self.padding_samples = self.sample_rate * settings.VAD_PADDING_MS // 1000
+        self.vad = webrtcvad.Vad(settings.VAD_AGGRESSIVENESS)
+        self.reset()
+
+    def reset(self):
+        self._pending = bytearray()
+        self._voiced_run = 0
+        self.frames_seen = 0
+        self.first_speech_frame: int | None = None
+        self.last_speech_frame: int | None = None
+
+    @property
+    def speech_started(self) -> bool:
+        return self.first_speech_frame is not None
+
+    @property
+    def endpoint(self) -> bool:
+        """True once speech was heard and has been followed by enough silence."""
+        if self.last_speech_frame is None:
+            return False
+        return self.frames_seen - 1 - self.last_speech_frame >= self.endpoint_frames
+
+    def feed(self, pcm: bytes):
+        """Classifies every complete frame in `pcm`; partial frames carry over."""
+        self._pending.extend(pcm)
+        offset = 0
+        while len(self._pending) - offset >= self.frame_bytes:
+            frame = bytes(self._pending[offset:offset + self.frame_bytes])
+            offset += self.frame_bytes
+
+            if self.vad.is_speech(frame, self.sample_rate):
+                self._voiced_run += 1
+                if self._voiced_run >= self.min_speech_frames:
+                    if self.first_speech_frame is None:
+                        self.first_speech_frame = self.frames_seen - self._voiced_run + 1
+                    self.last_speech_frame = self.frames_seen
+            else:
+                self._voiced_run = 0
+            self.frames_seen += 1
+        del self._pending[:offset]
+
+    def speech_bounds(self) -> tuple[int, int] | None:
+        """
+        Sample range [start, end) covering the detected speech plus VAD_PADDING_MS on
+        each side, or None if no speech was found.
+        """
+        if self.first_speech_frame is None:
+            return None
+        start = max(0, self.first_speech_frame * self.frame_samples - self.padding_samples)
+        end = (self.last_speech_frame + 1) * self.frame_samples + self.padding_samples
+        return start, end
@@ -0,0 +1,134 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+
+class TranscriberBusyError(Exception):
+    """Raised when the admission queue is full."""
+
+
+@dataclass
+class _Job:
+    fn: Callable
+    args: tuple
+    future: asyncio.Future
+    batch_key: Hashable | None = None
+
+
+class TranscriptionPool:
+    """
+    Bounded pool of model workers in front of the shared WhisperModel.
+
+    - `workers` jobs run at once, each on its own executor thread. The model is built
+      with the same `num_workers`, so CTranslate2 can actually run them in parallel.
+    - At most `queue_size` jobs may wait; beyond that submissions fail fast with
+      TranscriberBusyError instead of piling up.
+    - Jobs submitted with the same `batch_key` (short utterances, same decoding
+      profile) that are waiting together are handed to `batch_fn` as a single batched
+      decode, as a list of their argument tuples. When other workers are busy, a free
+      worker waits up to `batch_window` seconds for companions before running alone.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_size: int,
+        batch_fn: Callable[[list[tuple]], list] | None = None,
+        batch_max_size: int = 1,
+        batch_window: float = 0.0,
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.batch_fn = batch_fn
+        self.batch_max_size = max(1, batch_max_size)
+        self.batch_window = batch_window
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+        self._pending: deque[_Job] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._busy = 0
+        self._batches = 0
+        self._batched_jobs = 0
+        self._rejected = 0
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, fn: Callable, *args, batch_key: Hashable | None = None) -> Any:
+        """Queues fn(*args) and waits for its result."""
+        self._ensure_started()
+        if len(self._pending) >= self.queue_size:
+            self._rejected += 1
+            raise TranscriberBusyError(f"Transcription queue is full ({self.queue_size} pending).")
+
+        loop = asyncio.get_running_loop()
+        job = _Job(fn, args, loop.create_future(), batch_key if self.batch_fn is not None else None)
+        self._pending.append(job)
+        self._wakeup.set()
+        return await job.future
+
+    async def _next_batch(self) -> list[_Job]:
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+        job = self._pending.popleft()
+        batch = [job]
+        if job.batch_key is None or self.batch_max_size == 1:
+            return batch
+
+        # Only worth delaying when we're under concurrent load
+        if self.batch_window > 0 and self._busy > 0 and not any(j.batch_key == job.batch_key for j in self._pending):
+            await asyncio.sleep(self.batch_window)
+
+        for other in list(self._pending):
+            if len(batch) >= self.batch_max_size:
+                break
+            if other.batch_key == job.batch_key:
+                self._pending.remove(other)
+                batch.append(other)
+        return batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [job for job in await self._next_batch() if not job.future.done()]
+            if not batch:
+                continue
+
+            self._busy += 1
+            try:
+                if len(batch) == 1:
+                    job = batch[0]
+                    results = [await loop.run_in_executor(self._executor, job.fn, *job.args)]
+                else:
+                    self._batches += 1
+                    self._batched_jobs += len(batch)
+                    results = await loop.run_in_executor(self._executor, self.batch_fn, [job.args for job in batch])
+
+                for job, result in zip(batch, results):
+                    if not job.future.done():
+                        job.future.set_result(result)
+            except Exception as e:
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            finally:
+                self._busy -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy": self._busy,
+            "queued": len(self._pending),
+            "queue_size": self.queue_size,
+            "batches": self._batches,
+            "batched_jobs": self._batched_jobs,
+            "rejected": self._rejected,
+        }
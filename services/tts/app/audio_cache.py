@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a sentence for cache keys (Unicode NFC, collapsed whitespace)."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class SynthesisCache:
+    """
+    Content-addressed cache of synthesized sentences (24 kHz int16 mono PCM).
+
+    - Keys are a hash of (normalized sentence, voice, language, model version), so a
+      different voice file or model checkpoint never serves stale audio.
+    - The in-memory LRU is bounded by total bytes (`max_memory_bytes`).
+    - When `cache_dir` is set, entries are also written to disk (bounded by
+      `max_disk_bytes`, least recently used removed first) and survive restarts.
+    """
+
+    def __init__(self, max_memory_bytes: int, cache_dir: Optional[str] = None, max_disk_bytes: int = 0):
+        self.max_memory_bytes = max(0, max_memory_bytes)
+        self.cache_dir = cache_dir or None
+        self.max_disk_bytes = max(0, max_disk_bytes)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(text: str, voice: str, language: str, model_version: str) -> str:
+        payload = "\x1f".join((normalize_text(text), voice, language, model_version))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # --- Memory level ---
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # --- Disk level ---
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def _load_from_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)  # Mark as recently used
+            return audio
+        except FileNotFoundError:
+            return None
+
+    def _save_to_disk(self, key: str, audio: bytes):
+        if not self.cache_dir or len(audio) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"--- Could not persist synthesized audio {key[:12]}: {e} ---")
+            return
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pcm"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    # --- Public API ---
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return audio
+
+        audio = self._load_from_disk(key)
+        with self._lock:
+            if audio is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._remember(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        if not audio:
+            return
+        self._remember(key, audio)
+        self._save_to_disk(key, audio)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
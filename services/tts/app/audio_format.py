@@ -0,0 +1,183 @@
+import struct
+from typing import Optional
+
+import numpy as np
+
+# XTTS output: 24 kHz, 16-bit, mono
+MODEL_SAMPLE_RATE = 24000
+CHANNELS = 1
+SAMPLE_WIDTH = 2
+
+FORMATS = ("wav", "pcm", "opus")
+# Opus only encodes at these rates
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+_ACCEPT_TO_FORMAT = {
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/l16": "pcm",
+    "audio/pcm": "pcm",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+}
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """
+    Explicit `format` in the request wins; otherwise the first audio type in the
+    Accept header we can produce; otherwise a streaming WAV.
+    Raises ValueError for an unknown explicit format.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported format '{requested}'. Available: {', '.join(FORMATS)}")
+        return requested
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in _ACCEPT_TO_FORMAT:
+            return _ACCEPT_TO_FORMAT[media_type]
+    return "wav"
+
+
+def wav_header(sample_rate: int, channels: int = CHANNELS, sample_width: int = SAMPLE_WIDTH) -> bytes:
+    """
+    44-byte PCM WAV header for a stream of unknown length. RIFF and data sizes are set
+    to 0xFFFFFFFF, which players and decoders treat as "read until EOF".
+    """
+    byte_rate = sample_rate * channels * sample_width
+    return b"".join((
+        b"RIFF", struct.pack("<I", 0xFFFFFFFF), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                             channels * sample_width, sample_width * 8),
+        b"data", struct.pack("<I", 0xFFFFFFFF),
+    ))
+
+
+class StreamResampler:
+    """
+    Chunk-by-chunk linear-interpolation resampler for int16 mono PCM.
+    Keeps the fractional position and last input sample between calls, so chunk
+    boundaries don't produce clicks.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int):
+        self.step = source_rate / target_rate
+        self._position = 0.0  # Next output sample, in input samples relative to _previous
+        self._previous: Optional[np.ndarray] = None
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        if samples.size == 0:
+            return b""
+        if self._previous is not None:
+            samples = np.concatenate((self._previous, samples))
+        else:
+            self._position = 0.0
+
+        positions = np.arange(self._position, samples.size - 1, self.step)
+        output = np.interp(positions, np.arange(samples.size), samples)
+
+        # Carry the last sample so the next chunk interpolates across the boundary
+        next_position = positions[-1] + self.step if positions.size else self._position
+        self._position = next_position - (samples.size - 1)
+        self._previous = samples[-1:]
+        return np.clip(np.round(output), -32768, 32767).astype(np.int16).tobytes()
+
+
+class _ByteSink:
+    """Append-only file object for soundfile; encoded bytes are drained as they are written."""
+
+    def __init__(self):
+        self._parts = []
+        self._written = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._written += len(data)
+        return len(data)
+
+    def read(self, size=-1) -> bytes:
+        return b""
+
+    def tell(self) -> int:
+        return self._written
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        target = {0: offset, 1: self._written + offset, 2: self._written + offset}[whence]
+        if target != self._written:
+            raise OSError("Streaming sink is not seekable")
+        return self._written
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class StreamEncoder:
+    """
+    Turns 24 kHz int16 PCM chunks into the negotiated output format.
+
+    header() is sent first, encode() once per chunk, finish() at the end; any of them
+    may return b"" (e.g. Opus buffers until a full Ogg page is ready).
+    """
+
+    def __init__(self, fmt: str, sample_rate: Optional[int] = None):
+        self.format = fmt
+        self.sample_rate = sample_rate or MODEL_SAMPLE_RATE
+        if fmt == "opus" and self.sample_rate not in OPUS_SAMPLE_RATES:
+            raise ValueError(
+                f"Opus does not support {self.sample_rate} Hz. "
+                f"Use one of: {', '.join(str(r) for r in OPUS_SAMPLE_RATES)}"
+            )
+
+        self._resampler = (
+            StreamResampler(MODEL_SAMPLE_RATE, self.sample_rate)
+            if self.sample_rate != MODEL_SAMPLE_RATE else None
+        )
+        self._sink = None
+        self._opus = None
+        if fmt == "opus":
+            import soundfile as sf
+
+            self._sink = _ByteSink()
+            self._opus = sf.SoundFile(
+                self._sink, mode="w", samplerate=self.sample_rate, channels=CHANNELS,
+                format="OGG", subtype="OPUS"
+            )
+
+    @property
+    def media_type(self) -> str:
+        if self.format == "opus":
+            return "audio/ogg; codecs=opus"
+        if self.format == "pcm":
+            return f"audio/L16; rate={self.sample_rate}; channels={CHANNELS}"
+        return "audio/wav"
+
+    def headers(self) -> dict:
+        """Format metadata so clients don't have to assume it."""
+        return {
+            "X-Audio-Format": self.format,
+            "X-Audio-Sample-Rate": str(self.sample_rate),
+            "X-Audio-Channels": str(CHANNELS),
+            "X-Audio-Sample-Width": str(SAMPLE_WIDTH),
+        }
+
+    def header(self) -> bytes:
+        return wav_header(self.sample_rate) if self.format == "wav" else b""
+
+    def encode(self, pcm: bytes) -> bytes:
+        if self._resampler:
+            pcm = self._resampler.process(pcm)
+        if self._opus is None:
+            return pcm
+        self._opus.buffer_write(pcm, dtype="int16")
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        if self._opus is None:
+            return b""
+        self._opus.close()
+        return self._sink.drain()
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the service already has `max_requests` synthesis requests in flight."""
+
+
+class InferenceExecutor(Executor):
+    """
+    Dedicated executor for all XTTS model work.
+
+    - A single worker thread (by default) so the model is never used concurrently
+      and the event loop stays free for health checks and streaming I/O.
+    - Requests are admitted with acquire()/release(); once `max_requests` are in
+      flight new ones are rejected (backpressure) instead of queueing without bound.
+    - stats() reports queue depth without touching the model.
+    """
+
+    def __init__(self, max_requests: int, workers: int = 1):
+        self.max_requests = max(1, max_requests)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xtts")
+        self._lock = threading.Lock()
+        self._active_requests = 0
+        self._queued_jobs = 0
+        self._running_jobs = 0
+        self._rejected = 0
+
+    # --- Request admission ---
+    def acquire(self):
+        with self._lock:
+            if self._active_requests >= self.max_requests:
+                self._rejected += 1
+                raise InferenceQueueFull(f"TTS is busy ({self._active_requests} requests in flight).")
+            self._active_requests += 1
+
+    def release(self):
+        with self._lock:
+            self._active_requests = max(0, self._active_requests - 1)
+
+    # --- Job execution ---
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            self._queued_jobs += 1
+
+        def job():
+            with self._lock:
+                self._queued_jobs -= 1
+                self._running_jobs += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running_jobs -= 1
+
+        return self._executor.submit(job)
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) on the inference thread and awaits the result."""
+        return await asyncio.get_running_loop().run_in_executor(self, fn, *args)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_requests": self._active_requests,
+                "max_requests": self.max_requests,
+                "queued_jobs": self._queued_jobs,
+                "running_jobs": self._running_jobs,
+                "rejected": self._rejected,
+            }
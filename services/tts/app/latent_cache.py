@@ -0,0 +1,190 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import torch
+
+Latents = Tuple[torch.Tensor, torch.Tensor]
+
+
+def _voice_name(key: str) -> str:
+    """Voice name part of a "<name>-<hash>" cache key."""
+    return key.rsplit("-", 1)[0]
+
+
+class SpeakerLatentCache:
+    """
+    Two-level cache for XTTS conditioning latents (gpt_cond_latent, speaker_embedding).
+
+    - Entries are keyed by voice filename + SHA-256 of the WAV content, so editing or
+      replacing a voice file invalidates its latents automatically.
+    - An in-memory LRU holds up to `max_memory` voices.
+    - Latents are also serialized to `cache_dir` so a restarted container doesn't have
+      to recompute them; the directory keeps at most `max_disk` files (least recently
+      used are removed first).
+    """
+
+    def __init__(self, cache_dir: str, device: str, max_memory: int = 8, max_disk: int = 64):
+        self.cache_dir = cache_dir
+        self.device = device
+        self.max_memory = max(1, max_memory)
+        self.max_disk = max(1, max_disk)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._memory: "OrderedDict[str, Latents]" = OrderedDict()
+        # voice path -> (mtime_ns, size, content hash); avoids rehashing unchanged files
+        self._fingerprints: dict = {}
+        self._lock = threading.RLock()
+
+    # --- Keys ---
+    def _known_hash(self, voice_path: str, st: os.stat_result) -> Optional[str]:
+        """Hash from a previous read if the file is unchanged (stat only, no I/O on the content)."""
+        with self._lock:
+            cached = self._fingerprints.get(voice_path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        return None
+
+    def _content_hash(self, voice_path: str) -> str:
+        st = os.stat(voice_path)
+        known = self._known_hash(voice_path, st)
+        if known is not None:
+            return known
+
+        digest = hashlib.sha256()
+        with open(voice_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()[:16]
+
+        with self._lock:
+            self._fingerprints[voice_path] = (st.st_mtime_ns, st.st_size, content_hash)
+        return content_hash
+
+    def voice_key(self, voice_path: str) -> str:
+        """Voice filename + content hash; changes whenever the WAV does."""
+        name = os.path.splitext(os.path.basename(voice_path))[0]
+        return f"{name}-{self._content_hash(voice_path)}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    # --- Memory level ---
+    def _remember(self, key: str, latents: Latents):
+        with self._lock:
+            # Drop stale entries for the same voice (content changed). Compare the whole
+            # name: a prefix match would make "es" evict "es-female".
+            name = _voice_name(key)
+            for old in [k for k in self._memory if _voice_name(k) == name and k != key]:
+                del self._memory[old]
+
+            self._memory[key] = latents
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+    def lookup(self, voice_path: str) -> Optional[Latents]:
+        """In-memory hit only (no disk reads, no model work)."""
+        key = self.voice_key(voice_path)
+        with self._lock:
+            latents = self._memory.get(key)
+            if latents is not None:
+                self._memory.move_to_end(key)
+            return latents
+
+    def peek(self, voice_path: str) -> Optional[Latents]:
+        """
+        Like lookup(), but never hashes the WAV: returns None when the file is new or
+        has changed since it was last hashed. Cheap enough for the event loop.
+        """
+        content_hash = self._known_hash(voice_path, os.stat(voice_path))
+        if content_hash is None:
+            return None
+        name = os.path.splitext(os.path.basename(voice_path))[0]
+        key = f"{name}-{content_hash}"
+        with self._lock:
+            latents = self._memory.get(key)
+            if latents is not None:
+                self._memory.move_to_end(key)
+            return latents
+
+    # --- Disk level ---
+    def _load_from_disk(self, key: str) -> Optional[Latents]:
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = torch.load(path, map_location=self.device, weights_only=True)
+            os.utime(path)  # Mark as recently used
+            return data["gpt_cond_latent"], data["speaker_embedding"]
+        except Exception as e:
+            print(f"--- Discarding unreadable latent cache file {path}: {e} ---")
+            os.remove(path)
+            return None
+
+    def _save_to_disk(self, key: str, latents: Latents):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            gpt_cond_latent, speaker_embedding = latents
+            torch.save(
+                {"gpt_cond_latent": gpt_cond_latent.cpu(), "speaker_embedding": speaker_embedding.cpu()},
+                tmp_path
+            )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"--- Could not persist latents for {key}: {e} ---")
+            return
+
+        name = _voice_name(key)
+        files = [f for f in os.listdir(self.cache_dir) if f.endswith(".pt")]
+        for f in files:
+            # Older hash of the same voice
+            if _voice_name(f[:-len(".pt")]) == name and f != f"{key}.pt":
+                os.remove(os.path.join(self.cache_dir, f))
+
+        files = sorted(
+            (os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".pt")),
+            key=os.path.getmtime
+        )
+        for stale in files[:max(0, len(files) - self.max_disk)]:
+            os.remove(stale)
+
+    # --- Public API ---
+    def get(self, voice_path: str, compute: Callable[[], Latents]) -> Latents:
+        """Memory -> disk -> compute (and persist)."""
+        key = self.voice_key(voice_path)
+        latents = self.lookup(voice_path)
+        if latents is not None:
+            print(f"--- Cache HIT (memory) for voice: {key} ---")
+            return latents
+
+        latents = self._load_from_disk(key)
+        if latents is not None:
+            print(f"--- Cache HIT (disk) for voice: {key} ---")
+        else:
+            print(f"--- Cache MISS for voice: {key} ---")
+            latents = compute()
+            self._save_to_disk(key, latents)
+
+        self._remember(key, latents)
+        return latents
+
+    def preload(self, voice_paths):
+        """Loads already-persisted latents into memory without computing anything."""
+        loaded = 0
+        for voice_path in voice_paths:
+            key = self.voice_key(voice_path)
+            latents = self._load_from_disk(key)
+            if latents is not None:
+                self._remember(key, latents)
+                loaded += 1
+        return loaded
+
+    def stats(self) -> dict:
+        with self._lock:
+            memory_entries = len(self._memory)
+        disk_entries = sum(1 for f in os.listdir(self.cache_dir) if f.endswith(".pt"))
+        return {"memory_entries": memory_entries, "disk_entries": disk_entries}
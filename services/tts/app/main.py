@@ -1,8 +1,9 @@
 import os
 import torch
 import torchaudio
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import Optional
 from contextlib import asynccontextmanager, contextmanager
@@ -18,10 +19,29 @@ from huggingface_hub import snapshot_download
 
 # --- Local Imports ---
 from .text_processing import split_into_sentences
+from .pipeline import SentencePipeline
+from .inference import InferenceExecutor, InferenceQueueFull
+from .latent_cache import SpeakerLatentCache
+from .audio_cache import SynthesisCache
+from .audio_format import StreamEncoder, negotiate_format
 
 # --- Constants ---
 VOICES_DIR = "voices"
 OUTPUT_DIR = "audio_outputs"
+# Sentences synthesized ahead of the one currently streaming to the client
+PIPELINE_LOOKAHEAD = int(os.getenv("TTS_PIPELINE_LOOKAHEAD", "2"))
+# Synthesis requests allowed in flight before answering 503
+MAX_QUEUED_REQUESTS = int(os.getenv("TTS_MAX_QUEUE", "8"))
+# Speaker latents persisted across restarts (keyed by voice filename + content hash)
+LATENTS_CACHE_DIR = os.getenv("TTS_LATENTS_CACHE_DIR", "latents_cache")
+LATENTS_MEMORY_SIZE = int(os.getenv("TTS_LATENTS_MEMORY_SIZE", "8"))
+LATENTS_DISK_SIZE = int(os.getenv("TTS_LATENTS_DISK_SIZE", "64"))
+# Load every persisted voice at startup instead of on first use
+PRELOAD_LATENTS = os.getenv("TTS_PRELOAD_LATENTS", "true").lower() == "true"
+# Synthesized sentences reused across requests (memory budget, optional disk persistence)
+AUDIO_CACHE_MB = int(os.getenv("TTS_AUDIO_CACHE_MB", "64"))
+AUDIO_CACHE_DIR = os.getenv("TTS_AUDIO_CACHE_DIR", "")
+AUDIO_CACHE_DISK_MB = int(os.getenv("TTS_AUDIO_CACHE_DISK_MB", "256"))
 os.makedirs(VOICES_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -34,10 +54,14 @@ print("--- VERSION CHECK: STABLE RESET v1.0 (Commas + 140 chars) ---")
 
 # --- TTS Model Loading ---
 tts_model = None
+# Checkpoint revision, part of the synthesized-audio cache key
+model_version = "xtts-v2"
+# All model work (latents, batch and stream inference) runs here, never on the event loop
+inference_executor = InferenceExecutor(max_requests=MAX_QUEUED_REQUESTS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global tts_model
+    global tts_model, model_version
     print("--- Downloading and loading XTTSv2 model ---")
     try:
         checkpoint_dir = snapshot_download("coqui/XTTS-v2")
@@ -49,7 +73,9 @@ async def lifespan(app: FastAPI):
         tts_model = Xtts.init_from_config(config)
         tts_model.load_checkpoint(config, checkpoint_dir=checkpoint_dir, use_deepspeed=False)
         tts_model.to(device)
+        model_version = os.path.basename(os.path.normpath(checkpoint_dir))
         print("--- XTTSv2 model loaded successfully ---")
+        warm_up_latents()
     except Exception as e:
         print(f"--- FATAL: Failed to load XTTSv2 model: {e} ---")
         # In a real app, you might want to exit or handle this more gracefully
@@ -58,6 +84,7 @@ async def lifespan(app: FastAPI):
     yield
     
     print("--- Cleaning up TTS model ---")
+    inference_executor.shutdown(wait=False, cancel_futures=True)
     # No explicit cleanup needed for the model object itself, Python's GC will handle it.
 
 
@@ -100,11 +127,37 @@ class TTSRequest(BaseModel):
     text: str
     voice_sample: Optional[str] = None
     language: Optional[str] = None
+    # Stream only: "wav" (default), "pcm" or "opus"; falls back to the Accept header
+    format: Optional[str] = None
+    # Stream only: resample the output (defaults to the model's 24000 Hz)
+    sample_rate: Optional[int] = None
 
 
 # --- Voice Latent Caching ---
-# Cache structure: { "voice_filename": (gpt_cond_latent, speaker_embedding) }
-speaker_latents_cache = {}
+speaker_latents_cache = SpeakerLatentCache(
+    LATENTS_CACHE_DIR,
+    device=device,
+    max_memory=LATENTS_MEMORY_SIZE,
+    max_disk=LATENTS_DISK_SIZE
+)
+
+def warm_up_latents():
+    """
+    Called at startup. Loads persisted latents for the voices in VOICES_DIR and makes
+    sure the configured default voice is ready (computing it if it was never cached).
+    """
+    if PRELOAD_LATENTS:
+        voice_paths = [
+            os.path.join(VOICES_DIR, f) for f in sorted(os.listdir(VOICES_DIR)) if f.endswith(".wav")
+        ]
+        loaded = speaker_latents_cache.preload(voice_paths)
+        print(f"--- Preloaded latents for {loaded}/{len(voice_paths)} voices from disk ---")
+
+    if current_config.voice_sample:
+        try:
+            get_speaker_latents(current_config.voice_sample)
+        except HTTPException as e:
+            print(f"--- Could not warm up default voice {current_config.voice_sample}: {e.detail} ---")
 
 def get_speaker_latents(voice_sample_name: str):
     """
@@ -114,28 +167,56 @@ def get_speaker_latents(voice_sample_name: str):
     if not voice_sample_name.endswith(".wav"):
         raise HTTPException(status_code=400, detail="Invalid voice sample format. Only .wav files are supported.")
     
-    # Check cache first
-    if voice_sample_name in speaker_latents_cache:
-        print(f"--- Cache HIT for voice: {voice_sample_name} ---")
-        return speaker_latents_cache[voice_sample_name]
-    
-    print(f"--- Cache MISS for voice: {voice_sample_name} ---")
-    
     voice_path = os.path.join(VOICES_DIR, voice_sample_name)
     if not os.path.exists(voice_path):
         raise HTTPException(status_code=404, detail=f"Voice sample '{voice_sample_name}' not found in '{VOICES_DIR}'.")
-        
-    print(f"--- Computing latents for: {voice_path} ---")
+
+    def compute():
+        print(f"--- Computing latents for: {voice_path} ---")
+        return tts_model.get_conditioning_latents(audio_path=[voice_path])
+
     try:
-        gpt_cond_latent, speaker_embedding = tts_model.get_conditioning_latents(audio_path=[voice_path])
-        # Cache the result
-        speaker_latents_cache[voice_sample_name] = (gpt_cond_latent, speaker_embedding)
-        return gpt_cond_latent, speaker_embedding
+        return speaker_latents_cache.get(voice_path, compute)
     except Exception as e:
         print(f"--- Error computing latents: {e} ---")
         raise HTTPException(status_code=500, detail=f"Failed to process voice sample: {str(e)}")
 
 
+# --- Synthesized Audio Caching ---
+synthesis_cache = SynthesisCache(
+    max_memory_bytes=AUDIO_CACHE_MB * 1024 * 1024,
+    cache_dir=AUDIO_CACHE_DIR,
+    max_disk_bytes=AUDIO_CACHE_DISK_MB * 1024 * 1024
+)
+
+def with_punctuation(sentence: str) -> str:
+    """
+    XTTS is much more stable if text ends with punctuation.
+    If the chunk was cut abruptly use a comma to induce a short pause/continuation flow.
+    """
+    if sentence[-1] not in ".,!?;:":
+        sentence += ","
+    return sentence
+
+def synthesis_key(sentence: str, voice_sample_name: str, language: str) -> str:
+    voice = speaker_latents_cache.voice_key(os.path.join(VOICES_DIR, voice_sample_name))
+    return SynthesisCache.key(with_punctuation(sentence), voice, language, model_version)
+
+
+async def load_speaker_latents(voice_sample_name: str):
+    """
+    Async access to speaker latents: in-memory hits for already-fingerprinted voices
+    return immediately (only a stat on the loop); hashing a new or changed WAV, disk
+    loads and misses run on the inference executor so the event loop is never blocked.
+    """
+    voice_path = os.path.join(VOICES_DIR, voice_sample_name)
+    if voice_sample_name.endswith(".wav") and os.path.exists(voice_path):
+        latents = speaker_latents_cache.peek(voice_path)
+        if latents is not None:
+            return latents
+    return await inference_executor.run(get_speaker_latents, voice_sample_name)
+
+
 
 
 
@@ -144,7 +225,14 @@ def get_speaker_latents(voice_sample_name: str):
 async def root():
     if tts_model is None:
         raise HTTPException(status_code=503, detail="TTS model is not available.")
-    return {"status": "online", "message": "TTS service is running", "config": current_config}
+    return {
+        "status": "online",
+        "message": "TTS service is running",
+        "config": current_config,
+        "inference": inference_executor.stats(),
+        "latents_cache": speaker_latents_cache.stats(),
+        "audio_cache": synthesis_cache.stats()
+    }
 
 
 @app.post("/api/config")
@@ -163,7 +251,7 @@ async def update_config(config: ServiceConfig):
         print(f"--- Config: Pre-loading voice {config.voice_sample} ---")
         try:
             # Trigger latent computation (this will cache it)
-            get_speaker_latents(config.voice_sample)
+            await load_speaker_latents(config.voice_sample)
             current_config.voice_sample = config.voice_sample
             print(f"--- Config: Voice {config.voice_sample} loaded and active ---")
         except HTTPException as e:
@@ -184,7 +272,12 @@ async def tts_batch(request: TTSRequest):
         raise HTTPException(status_code=503, detail="TTS model is not available.")
         
     print(f"--- Received batch request: {request} ---")
-    
+
+    try:
+        inference_executor.acquire()
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
     try:
         # Determine voice and language (Request > Config > Default is handled by logic)
         voice_sample = request.voice_sample or current_config.voice_sample
@@ -196,7 +289,7 @@ async def tts_batch(request: TTSRequest):
              language = "es" # Fallback if even config is empty
 
         # Get latents (cached or computed)
-        gpt_cond_latent, speaker_embedding = get_speaker_latents(voice_sample)
+        gpt_cond_latent, speaker_embedding = await load_speaker_latents(voice_sample)
 
         # Split text into chunks to avoid distortion on long texts
         sentences = split_into_sentences(request.text)
@@ -204,27 +297,38 @@ async def tts_batch(request: TTSRequest):
 
         generated_wavs = []
         silence_duration = 0.25 # seconds
-        silence = torch.zeros(1, int(24000 * silence_duration)) # 24kHz silence
+        silence = torch.zeros(int(24000 * silence_duration)) # 24kHz silence
 
         print("--- Starting batch inference (per chunk) ---")
         for i, sentence in enumerate(sentences):
             if not sentence.strip(): continue
-            
-            # Ensure punctuation for stability
-            if sentence[-1] not in ".,!?;:":
-                sentence += ","
 
-            print(f"--- Processing chunk {i+1}/{len(sentences)}: '{sentence[:30]}...' ---")
-            
-            out = tts_model.inference(
-                sentence,
-                language,
-                gpt_cond_latent,
-                speaker_embedding
-            )
-            # out["wav"] is a list or numpy array, convert to tensor
-            wav_tensor = torch.tensor(out["wav"])
-            generated_wavs.append(wav_tensor)
+            # The key hashes the voice WAV (first use / after edits): off the loop
+            key = await asyncio.to_thread(synthesis_key, sentence, voice_sample, language)
+            cached = await asyncio.to_thread(synthesis_cache.get, key)
+            if cached is not None:
+                print(f"--- Audio cache HIT for chunk {i+1}/{len(sentences)} ---")
+                wav_tensor = torch.from_numpy(np.frombuffer(cached, dtype=np.int16).astype(np.float32) / 32767)
+                generated_wavs.append(wav_tensor)
+            else:
+                # Ensure punctuation for stability
+                sentence = with_punctuation(sentence)
+
+                print(f"--- Processing chunk {i+1}/{len(sentences)}: '{sentence[:30]}...' ---")
+
+                # One job per sentence so concurrent streams can interleave on the model
+                out = await inference_executor.run(
+                    tts_model.inference,
+                    sentence,
+                    language,
+                    gpt_cond_latent,
+                    speaker_embedding
+                )
+                # out["wav"] is a list or numpy array, convert to tensor
+                wav_tensor = torch.tensor(out["wav"])
+                generated_wavs.append(wav_tensor)
+                pcm = (np.clip(wav_tensor.numpy(), -1, 1) * 32767).astype(np.int16).tobytes()
+                await asyncio.to_thread(synthesis_cache.put, key, pcm)
             
             # Add silence after each chunk (except the last one)
             if i < len(sentences) - 1:
@@ -242,7 +346,7 @@ async def tts_batch(request: TTSRequest):
         output_path = os.path.join(OUTPUT_DIR, output_filename)
         
         # XTTS outputs at 24kHz
-        torchaudio.save(output_path, full_wav, 24000)
+        await asyncio.to_thread(torchaudio.save, output_path, full_wav, 24000)
         
         print(f"--- Audio generated at: {output_path} ---")
         return FileResponse(path=output_path, media_type="audio/wav", filename=output_filename)
@@ -252,15 +356,39 @@ async def tts_batch(request: TTSRequest):
             raise e
         print(f"--- Error during TTS generation: {e} ---")
         raise HTTPException(status_code=500, detail=f"An error occurred during TTS processing: {str(e)}")
+    finally:
+        inference_executor.release()
 
 
 @app.post("/api/tts/stream")
-async def tts_stream(request: TTSRequest):
+async def tts_stream(request: TTSRequest, http_request: Request):
     if tts_model is None:
         raise HTTPException(status_code=503, detail="TTS model is not available.")
 
     print(f"--- Received stream request: {request} ---")
 
+    try:
+        output_format = negotiate_format(request.format, http_request.headers.get("accept"))
+        encoder = StreamEncoder(output_format, request.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Backpressure: refuse up front rather than accept a stream we can't serve
+    try:
+        inference_executor.acquire()
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+    released = False
+
+    def release_slot():
+        # Called from the generator and as a background task (the generator never
+        # runs if the client disconnects before the body starts), so keep it idempotent
+        nonlocal released
+        if not released:
+            released = True
+            inference_executor.release()
+
     async def streaming_generator():
         try:
             # Determine voice and language
@@ -272,9 +400,14 @@ async def tts_stream(request: TTSRequest):
                 print("--- Error: No voice sample provided for stream ---")
                 return
 
+            # Container header first (streaming WAV of unknown length); empty for pcm/opus
+            header = encoder.header()
+            if header:
+                yield header
+
             # Get latents (cached or computed)
-            gpt_cond_latent, speaker_embedding = get_speaker_latents(voice_sample)
-            
+            gpt_cond_latent, speaker_embedding = await load_speaker_latents(voice_sample)
+
             # Split text into chunks to avoid distortion on long texts
             sentences = split_into_sentences(request.text)
             print(f"--- Stream text split into {len(sentences)} chunks ---")
@@ -283,40 +416,68 @@ async def tts_stream(request: TTSRequest):
             # 0.1 seconds * 24000 samples/sec * 2 bytes/sample (Shorter silence for comma flow)
             silence_bytes = b'\x00' * int(24000 * 0.1 * 2)
 
-            for i, sentence in enumerate(sentences):
-                if not sentence.strip():
-                    continue
+            sentences = [s for s in sentences if s.strip()]
+            language = language or "es"
+
+            def cached(sentence):
+                audio = synthesis_cache.get(synthesis_key(sentence, voice_sample, language))
+                if audio is not None:
+                    print(f"--- Audio cache HIT: '{sentence[:30]}...' ---")
+                return audio
 
-                # XTTS is much more stable if text ends with punctuation
-                
-                # XTTS is much more stable if text ends with punctuation
-                # If the chunk was cut abruptly use a comma to induce a short pause/continuation flow.
-                if sentence[-1] not in ".,!?;:":
-                    sentence += ","
+            def synthesize(sentence):
+                key = synthesis_key(sentence, voice_sample, language)
+                sentence = with_punctuation(sentence)
+
+                print(f"--- Streaming chunk: '{sentence[:30]}...' ---")
+                parts = []
 
-                print(f"--- Streaming chunk {i+1}/{len(sentences)}: '{sentence[:30]}...' ---")
-                
                 chunks = tts_model.inference_stream(
                     sentence,
-                    language or "es",
+                    language,
                     gpt_cond_latent,
                     speaker_embedding
                 )
-                
+
                 for chunk in chunks:
                     # Convert tensor to bytes
                     # Clamp values to [-1, 1] to prevent clipping/noise
                     chunk_np = chunk.cpu().numpy()
                     chunk_np = np.clip(chunk_np, -1, 1)
                     audio_bytes = (chunk_np * 32767).astype(np.int16).tobytes()
+                    parts.append(audio_bytes)
                     yield audio_bytes
-                
-                # Yield silence between sentences
-                if i < len(sentences) - 1:
-                    yield silence_bytes
+
+                # Only reached when the sentence was fully synthesized (not cancelled)
+                synthesis_cache.put(key, b"".join(parts))
+
+            # Sentence N+1 is synthesized in the background while sentence N streams out,
+            # with silence between sentences
+            pipeline = SentencePipeline(
+                synthesize,
+                sentences,
+                executor=inference_executor,
+                lookahead=PIPELINE_LOOKAHEAD,
+                gap=silence_bytes,
+                cached=cached
+            )
+            async for audio_bytes in pipeline.stream():
+                encoded = encoder.encode(audio_bytes)
+                if encoded:
+                    yield encoded
+            tail = encoder.finish()
+            if tail:
+                yield tail
 
             print("--- Finished streaming audio chunks ---")
         except Exception as e:
             print(f"--- An error occurred during streaming: {e} ---")
-
-    return StreamingResponse(streaming_generator(), media_type="audio/wav")
+        finally:
+            release_slot()
+
+    return StreamingResponse(
+        streaming_generator(),
+        media_type=encoder.media_type,
+        headers=encoder.headers(),
+        background=BackgroundTask(release_slot)
+    )
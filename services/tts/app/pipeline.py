@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, Iterable, List, Optional
+
+_END_OF_SENTENCE = object()
+_DONE = object()
+
+
+class SentencePipeline:
+    """
+    Producer/consumer pipeline for sentence-by-sentence synthesis.
+
+    A producer task submits one sentence at a time to `executor`, so sentence N+1 is
+    synthesized while sentence N is still being streamed to the client. Chunks are
+    forwarded as soon as the model yields them. At most `lookahead` sentences are
+    synthesized ahead of what the client has consumed, which bounds memory when the
+    client reads slower than real time.
+
+    If `cached` returns audio for a sentence it is forwarded directly, without
+    occupying the executor.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], Iterable[bytes]],
+        sentences: List[str],
+        executor: Optional[Executor] = None,
+        lookahead: int = 2,
+        gap: bytes = b"",
+        cached: Optional[Callable[[str], Optional[bytes]]] = None,
+    ):
+        self.synthesize = synthesize
+        self.sentences = sentences
+        self.executor = executor
+        self.lookahead = max(0, lookahead)
+        self.gap = gap
+        self.cached = cached
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.lookahead + 1)
+        cancelled = threading.Event()
+
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def synthesize_into(sentence: str):
+            # Runs on the executor thread; chunks are handed to the loop as they come out
+            for chunk in self.synthesize(sentence):
+                if cancelled.is_set():
+                    return
+                put(chunk)
+
+        async def produce():
+            try:
+                for sentence in self.sentences:
+                    await slots.acquire()
+                    audio = await asyncio.to_thread(self.cached, sentence) if self.cached else None
+                    if audio is not None:
+                        put(audio)
+                    else:
+                        await loop.run_in_executor(self.executor, synthesize_into, sentence)
+                    put(_END_OF_SENTENCE)
+            except Exception as e:
+                put(e)
+            finally:
+                put(_DONE)
+
+        producer = asyncio.create_task(produce())
+        remaining = len(self.sentences)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item is _END_OF_SENTENCE:
+                    remaining -= 1
+                    slots.release()
+                    if remaining > 0 and self.gap:
+                        yield self.gap
+                    continue
+                yield item
+        finally:
+            # Client went away (or we're done): stop synthesizing ahead
+            cancelled.set()
+            producer.cancel()
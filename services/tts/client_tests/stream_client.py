@@ -14,35 +14,23 @@ except ImportError:
 
 # --- Configuration ---
 DEFAULT_API_URL = "http://localhost:8000/api/tts/stream"
-# These settings match XTTS v2 output
-SAMPLE_RATE = 24000
-CHANNELS = 1
+# The server streams a WAV (44-byte header + 16-bit PCM) and announces the format
+# in the X-Audio-* response headers
+WAV_HEADER_SIZE = 44
 FORMAT = pyaudio.paInt16 if PYAUDIO_AVAILABLE else None
 
 def stream_audio(text, voice_sample=None, language="es", api_url=DEFAULT_API_URL, output_file="stream_output.wav"):
     
-    # 1. Setup PyAudio stream (if available)
     p = None
     stream = None
     play_audio = PYAUDIO_AVAILABLE # Local flag
 
-    if play_audio:
-        p = pyaudio.PyAudio()
-        try:
-            stream = p.open(format=FORMAT,
-                            channels=CHANNELS,
-                            rate=SAMPLE_RATE,
-                            output=True)
-            print("--- Audio Device Initialized ---")
-        except Exception as e:
-            print(f"Error initializing audio device: {e}")
-            play_audio = False # Disable playback for this run only
-
-    # 2. Prepare Request
+    # 1. Prepare Request
     headers = {"Content-Type": "application/json"}
     payload = {
         "text": text,
-        "language": language
+        "language": language,
+        "format": "wav"
     }
     if voice_sample:
         payload["voice_sample"] = voice_sample
@@ -53,18 +41,36 @@ def stream_audio(text, voice_sample=None, language="es", api_url=DEFAULT_API_URL
         # stream=True is critical here!
         with requests.post(api_url, json=payload, headers=headers, stream=True) as response:
             response.raise_for_status()
-            
+
+            # 2. Setup PyAudio stream (if available) with the announced format
+            sample_rate = int(response.headers.get("X-Audio-Sample-Rate", "24000"))
+            channels = int(response.headers.get("X-Audio-Channels", "1"))
+            if play_audio:
+                p = pyaudio.PyAudio()
+                try:
+                    stream = p.open(format=FORMAT,
+                                    channels=channels,
+                                    rate=sample_rate,
+                                    output=True)
+                    print(f"--- Audio Device Initialized ({sample_rate} Hz) ---")
+                except Exception as e:
+                    print(f"Error initializing audio device: {e}")
+                    play_audio = False # Disable playback for this run only
+
             print("--- Receiving Audio Stream ---")
-            # Open file for saving raw audio
+            header_pending = WAV_HEADER_SIZE
+            # Open file for saving the audio (a valid WAV, header included)
             with open(output_file, 'wb') as f:
                 # Iterate over chunks. 
                 # chunk_size=1024 is arbitrary, but good for networking.
                 # The server sends audio chunks as they are generated.
                 for chunk in response.iter_content(chunk_size=1024):
                     if chunk:
-                        # Play
-                        if play_audio and stream:
-                            stream.write(chunk)
+                        # Play (the WAV header is not audio)
+                        audio = chunk[header_pending:]
+                        header_pending = max(0, header_pending - len(chunk))
+                        if play_audio and stream and audio:
+                            stream.write(audio)
                         # Save
                         f.write(chunk)
             
@@ -2,8 +2,13 @@ import pyaudio
 import wave
 import numpy as np
 import os
+import sys
 from dotenv import load_dotenv
 
+# Mismo front end DSP que el orquestador
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "orchestrator"))
+from core.audio_dsp import AudioFrontEnd
+
 # Load env manually to ensure we use current setting
 load_dotenv(r"c:\Users\edgar\Documents\Proyectos2026\KodaVox\.env")
 
@@ -44,34 +49,28 @@ try:
     frames = []
     
     energies = []
+    peaks = []
+    clipped_chunks = 0
+    dsp = AudioFrontEnd(CHUNK, gain=GAIN)
     
     for i in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
         data = stream.read(CHUNK, exception_on_overflow=False)
         
-        # Apply logic identical to AudioCapturer
-        audio_data = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-        
-        # Calc raw energy before gain
-        raw_energy = np.sqrt(np.mean(audio_data**2))
-
-        # Apply Gain
-        if GAIN > 1.0:
-            audio_data = audio_data * GAIN
-            audio_data = np.clip(audio_data, -32768, 32767)
-            
-        # Calc final energy
-        energy = np.sqrt(np.mean(audio_data**2))
+        # Same processing as AudioCapturer (gain + clip + RMS/peak in one pass)
+        processed_data = dsp.process(data)
+        energy = dsp.rms
         energies.append(energy)
+        peaks.append(dsp.peak)
+        clipped_chunks += dsp.clipped
         
-        # Convert back
-        processed_data = audio_data.astype(np.int16).tobytes()
-        frames.append(processed_data)
+        # The processed buffer is reused on the next chunk: keep a copy
+        frames.append(bytes(processed_data))
         
         # Visual bar
         bar_len = int(energy / 50)
         bar = "█" * min(bar_len, 50)
         status = "🟢" if energy > THRESHOLD else "🔴"
-        print(f"RMS: {energy:6.1f} | {status} | {bar}", end="\r")
+        print(f"RMS: {energy:6.1f} (raw {dsp.raw_rms:6.1f}) | {status} | {bar}", end="\r")
 
     print("\n\n🛑 Recording finished.")
 
@@ -98,13 +97,16 @@ try:
     print(f" - Average RMS: {avg_energy:.2f}")
     print(f" - Max RMS:     {max_energy:.2f}")
     print(f" - Min RMS:     {min_energy:.2f}")
+    print(f" - Peak:        {np.max(peaks):.0f}")
+    print(f" - Noise floor: {dsp.noise_floor:.2f}")
+    print(f" - Clipped chunks: {clipped_chunks}")
     
     print("\nINTERPRETATION:")
     if max_energy < 50:
         print("❌ TOO QUIET: Audio is practically silent. Mic might be muted or wrong device.")
     elif max_energy < 200:
         print("⚠️ WEAK SIGNAL: Voice is very faint. Increase Gain or speak closer.")
-    elif max_energy > 30000:
+    elif max_energy > 30000 or clipped_chunks:
         print("⚠️ CLIPPING: Signal is too loud/distorted. Decrease Gain.")
     else:
         print("✅ GOOD LEVEL: Audio seems healthy.")
@@ -6,10 +6,15 @@ import sys
 import time
 from dotenv import load_dotenv
 
+# Mismo front end DSP que el orquestador
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "orchestrator"))
+from core.audio_dsp import AudioFrontEnd
+
 # Cargar configuración
 load_dotenv()
 
 RATE = int(os.getenv("SAMPLE_RATE", "16000"))
+CHUNK = int(os.getenv("CHUNK_SIZE", "1280"))
 CHANNELS = 1
 DURATION = 5  # Segundos
 FILENAME = "test_capture.wav"
@@ -44,11 +49,17 @@ def main():
         wav.write(FILENAME, RATE, recording)
         print(f"Audio guardado en: {FILENAME}")
         
-        # Calcular energía (RMS) para diagnóstico
-        # Convertir a float para evitar overflow al elevar al cuadrado
-        data_float = recording.astype(np.float64)
-        rms = np.sqrt(np.mean(data_float**2))
+        # Calcular energía (RMS) por chunks, igual que el orquestador
+        dsp = AudioFrontEnd(CHUNK)
+        samples = recording.reshape(-1)
+        energies, peak = [], 0.0
+        for start in range(0, len(samples), CHUNK):
+            dsp.process(samples[start:start + CHUNK])
+            energies.append(dsp.rms)
+            peak = max(peak, dsp.peak)
+        rms = float(np.sqrt(np.mean(np.square(energies))))
         print(f"Nivel de Energía Promedio (RMS): {rms:.2f}")
+        print(f"Pico: {peak:.0f} | Ruido de fondo: {dsp.noise_floor:.2f}")
         
         if rms < 10:
             print("⚠️ ADVERTENCIA: La señal es EXTREMADAMENTE baja. Es posible que el micrófono no esté captando nada.")